@@ -8,6 +8,10 @@ OMNIPARSER_API = 'http://localhost:8000/process/'
 
 # Gemini API endpoint
 GEMINI_API = 'http://localhost:5000/api/gemini/generate'
+GEMINI_STREAM_API = 'http://localhost:5000/api/gemini/stream'
+GEMINI_TIMEOUT_SECONDS = 60
+GEMINI_POOL_SIZE = 20  # keep-alive connections shared by all calls
+GEMINI_MAX_CONCURRENCY = 8  # requests in flight at once
 
 # Directory where screenshots are saved
 SCREENSHOT_DIR = './screenshots'
@@ -21,3 +25,4 @@ EMBEDDING_MODEL = 'openai'  # change to 'huggingface' or other if needed
 
 FAISS_INDEX_PATH = "storage/faiss_index.index"
 DOCSTORE_PATH = "storage/documents.json"
+EMBEDDING_CHECKPOINT_PATH = "storage/embedding_checkpoint.jsonl"  # batches embedded by an unfinished create_vectorstore run
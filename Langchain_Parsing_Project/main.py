@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 from config import SCREENSHOT_DIR, DOCSTORE_PATH
 from screenshot_capture import capture_screenshots_for_all_pages
 from parsers.omniparser_client import parse_image_with_retries
-from model.gemini_client import call_gemini_api
+from model.gemini_client import call_gemini_api, gemini_client
 from vectorstore.custom_diallab_embeddings import DialLabEmbeddings
 from vectorstore.custom_diallab_retriever import DialLabRetriever
 from vectorstore.loader import load_or_build_vectorstore
@@ -55,6 +55,14 @@ def load_or_parse_documents(screenshot_dir=SCREENSHOT_DIR):
     return texts
 
 
+async def ask_gemini(user_input, context):
+    try:
+        return await call_gemini_api(user_input, context)
+    finally:
+        # The session belongs to this asyncio.run loop; close it before the loop ends
+        await gemini_client.aclose()
+
+
 def run_pipeline():
     # Step 1: Optional - Capture new screenshots
     print("📸 Capturing screenshots from web app...")
@@ -110,7 +118,7 @@ def run_pipeline():
 
     # Step 9: Call Gemini API
     print("📡 Calling Gemini API...")
-    model_response = asyncio.run(call_gemini_api(user_input, context))
+    model_response = asyncio.run(ask_gemini(user_input, context))
 
     # Step 10: Display response
     print("\n💬 Gemini Response:")
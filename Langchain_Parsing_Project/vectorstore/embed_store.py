@@ -1,12 +1,18 @@
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
 from langchain.vectorstores import FAISS
 
 from vectorstore.custom_diallab_embeddings import DialLabEmbeddings
+from config import EMBEDDING_CHECKPOINT_PATH
 
 # Load environment variables from .env
 load_dotenv()
@@ -17,11 +23,91 @@ DIAL_LAB_BASE_URL = os.getenv("DIAL_LAB_BASE_URL", "https://ai-proxy.lab.epam.co
 DIAL_LAB_MODEL = os.getenv("DIAL_LAB_MODEL", "text-embedding-3-small-1")
 
 
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _load_checkpoint(checkpoint_path: Optional[str], model: Optional[str]) -> Dict[str, List[float]]:
+    vectors = {}
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from an interrupted run
+                    continue
+                # Vectors of another embedding model are not interchangeable
+                if record.get("model") == model:
+                    vectors[record["hash"]] = record["embedding"]
+    return vectors
+
+
+def embed_texts(
+    texts: List[str],
+    embeddings: DialLabEmbeddings,
+    batch_size: int = 64,
+    max_concurrency: int = 4,
+    checkpoint_path: Optional[str] = EMBEDDING_CHECKPOINT_PATH
+) -> List[List[float]]:
+    """
+    Embed every text once, `batch_size` texts per request and at most `max_concurrency` requests at a time.
+
+    Finished batches are appended to `checkpoint_path` (None disables it), so a run that fails
+    part way only embeds the missing texts when repeated.
+    """
+    model = getattr(embeddings, "model", None)
+    vectors = _load_checkpoint(checkpoint_path, model)
+    if checkpoint_path:
+        os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    hashes = [_text_hash(text) for text in texts]
+    text_by_hash = dict(zip(hashes, texts))  # identical chunks are embedded once
+    missing = [h for h in text_by_hash if h not in vectors]
+    if len(missing) < len(text_by_hash):
+        print(f"♻️ Resuming: {len(text_by_hash) - len(missing)} of {len(text_by_hash)} chunks already embedded.")
+
+    batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+    lock = threading.Lock()
+    failed = 0
+    start_time = time.perf_counter()
+
+    def embed_batch(batch):
+        batch_vectors = embeddings.embed_documents([text_by_hash[h] for h in batch])
+        with lock:
+            vectors.update(zip(batch, batch_vectors))
+            if checkpoint_path:
+                with open(checkpoint_path, "a", encoding="utf-8") as f:
+                    f.write("".join(
+                        json.dumps({"hash": h, "model": model, "embedding": v}) + "\n" for h, v in zip(batch, batch_vectors)
+                    ))
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = [pool.submit(embed_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                print(f"❌ Error embedding batch: {e}")
+
+    elapsed = time.perf_counter() - start_time
+    embedded = sum(1 for h in missing if h in vectors)
+    if embedded:
+        print(f"🧠 Embedded {embedded} chunks in {elapsed:.2f}s ({embedded / elapsed:.1f} chunks/s)")
+    if failed:
+        raise RuntimeError(f"{failed} of {len(batches)} embedding batches failed; run again to resume.")
+
+    return [vectors[h] for h in hashes]
+
+
 def create_vectorstore(
     parsed_texts: List[str],
     embeddings: Optional[DialLabEmbeddings] = None,
     chunk_size: int = 512,
-    chunk_overlap: int = 50
+    chunk_overlap: int = 50,
+    batch_size: int = 64,
+    max_concurrency: int = 4,
+    checkpoint_path: Optional[str] = EMBEDDING_CHECKPOINT_PATH
 ):
     # Step 1: Initialize the text splitter
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
@@ -40,17 +126,15 @@ def create_vectorstore(
             base_url=DIAL_LAB_BASE_URL
         )
 
-    # Optional: print chunks + partial embeddings
-    for doc in all_chunks:
-        print(f"\n🔹 Chunk:\n{doc.page_content}")
-        try:
-            emb = embeddings.embed_query(doc.page_content)
-            print(f"🧠 Embedding (first 5 values): {emb[:5]}")
-        except Exception as e:
-            print(f"❌ Error embedding chunk: {e}")
-        print("-" * 50)
-
-    # Step 4: Create FAISS vector store
-    vectorstore = FAISS.from_documents(all_chunks, embeddings)
+    # Step 4: Embed each chunk once, in concurrent batches
+    texts = [doc.page_content for doc in all_chunks]
+    vectors = embed_texts(texts, embeddings, batch_size, max_concurrency, checkpoint_path)
+
+    # Step 5: Write the vectors straight into a FAISS vector store
+    vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings)
+
+    # The checkpoint is only needed to resume an incomplete run
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
 
     return vectorstore
@@ -3,6 +3,10 @@
 WEBAPP_URL = "http://localhost:4200"  # Replace this
 OMNIPARSER_API = "http://localhost:8000/process/"
 GEMINI_API = "http://localhost:5000/api/gemini/generate"
+GEMINI_STREAM_API = "http://localhost:5000/api/gemini/stream"
+GEMINI_TIMEOUT_SECONDS = 60
+GEMINI_POOL_SIZE = 20  # keep-alive connections shared by all calls
+GEMINI_MAX_CONCURRENCY = 8  # requests in flight at once
 
 SCREENSHOT_DIR = "screenshots"
 CONTEXT_FILE = "data/parsed_contexts.json"
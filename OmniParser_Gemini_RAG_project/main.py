@@ -5,7 +5,7 @@ import asyncio
 import time
 from screenshot_capture import capture_screenshots_for_all_pages
 from omniparser_client import parse_image_with_retries
-from gemini_client import call_gemini_api
+from gemini_client import call_gemini_api, gemini_client
 from context_store import save_context, load_context
 from config import SCREENSHOT_DIR
 
@@ -65,8 +65,11 @@ async def run_gemini_with_context():
 
 
 async def main():
-    await process_screenshots_and_store_context()
-    await run_gemini_with_context()
+    try:
+        await process_screenshots_and_store_context()
+        await run_gemini_with_context()
+    finally:
+        await gemini_client.aclose()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,14 @@
-from fastapi import FastAPI
+import json
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from rag_pipeline.rag import gemini_rag_pipeline
+from rag_pipeline.rag import gemini_rag_pipeline, gemini_rag_pipeline_stream
+from rag_pipeline.embedder import get_embedding_model
+from rag_pipeline.generator import get_usage_totals
+from rag_pipeline.crawler import CrawlEngine
+from rag_pipeline.jobs import JobQueue, QueueFullError
+from rag_pipeline.config import EMBEDDING_PROCESS_WORKERS
 
 app = FastAPI()
 
@@ -9,7 +17,61 @@ class QueryRequest(BaseModel):
     question: str
     max_links: int = 10
 
+@app.on_event("startup")
+async def start_pipeline_services():
+    # Load the embedding model once so the first request does not pay for it
+    if EMBEDDING_PROCESS_WORKERS > 0:
+        get_embedding_model().start_pool(EMBEDDING_PROCESS_WORKERS)
+    else:
+        get_embedding_model().load()
+
+    # One Chromium shared by every crawl instead of one per request
+    app.state.crawl_engine = await CrawlEngine().start()
+    app.state.job_queue = JobQueue()
+
+@app.on_event("shutdown")
+async def stop_pipeline_services():
+    await app.state.crawl_engine.close()
+    get_embedding_model().shutdown()
+
 @app.post("/ask")
-def ask_question(req: QueryRequest):
-    answer = gemini_rag_pipeline(req.base_url, req.question, req.max_links)
-    return {"answer": answer}
+async def ask_question(req: QueryRequest):
+    try:
+        async with app.state.job_queue.slot():
+            answer, usage = await gemini_rag_pipeline(
+                req.base_url, req.question, req.max_links, crawl_engine=app.state.crawl_engine
+            )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"answer": answer, "usage": usage}
+
+@app.post("/ask/stream")
+async def ask_question_stream(req: QueryRequest):
+    # Reject before the stream starts so clients get a proper 503
+    if app.state.job_queue.is_full():
+        raise HTTPException(status_code=503, detail="Too many requests in flight")
+
+    # Server-Sent Events: one progress event per pipeline stage, then the answer token by token
+    async def event_stream():
+        try:
+            async with app.state.job_queue.slot():
+                async for event in gemini_rag_pipeline_stream(
+                    req.base_url, req.question, req.max_links, crawl_engine=app.state.crawl_engine
+                ):
+                    yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'event': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/metrics/embeddings")
+def embedding_metrics():
+    return get_embedding_model().get_metrics()
+
+@app.get("/metrics/usage")
+def usage_metrics():
+    return get_usage_totals()
+
+@app.get("/metrics/jobs")
+def job_metrics():
+    return app.state.job_queue.get_stats()
@@ -0,0 +1,226 @@
+"""
+Benchmark the RAG pipeline end to end against a synthetic site served from a local HTTP server.
+
+Each run times `gemini_rag_pipeline` itself, with the Gemini model replaced by a local stub
+returning a canned answer and token usage, so the numbers cover crawl, chunk, embed, index,
+search, prompt building and usage recording but no network call to Gemini. Each configuration
+runs in a fresh process, first against an empty index cache (cold) and then again with the
+cache warm.
+
+Run from the `RAG Model` directory:
+
+    python -m benchmarks.bench_pipeline --pages 20 --max-links 5 10 20 --concurrency 1 4 8 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from types import SimpleNamespace
+
+QUESTION = "What is the warranty period for product 3?"
+
+STUB_ANSWER = "Product 3 ships with a 15-month warranty and free returns within 30 days."
+
+PARAGRAPH = (
+    "The {name} ships with a {months}-month warranty and free returns within 30 days. "
+    "It is assembled in our Rotterdam plant, tested against ISO 9001 procedures and packaged "
+    "in recycled cardboard. Spare parts are stocked for at least seven years after release."
+)
+
+
+def build_site(root, pages, sections=4):
+    """
+    Write `pages` HTML pages sharing a nav bar, header and footer, each with its own sections.
+    """
+    nav = "".join(f'<li><a href="page_{j}.html">Product {j}</a></li>' for j in range(pages))
+    for i in range(pages):
+        body = "".join(
+            f"<h2>Section {s}</h2><p>{PARAGRAPH.format(name=f'product {i}', months=12 + i + s)}</p>"
+            f"<ul><li>Code PRD-{i:03d}-{s}</li><li>Weight {i + s} kg</li></ul>"
+            for s in range(sections)
+        )
+        html = (
+            f"<html><head><title>Product {i}</title></head><body>"
+            f"<nav><ul>{nav}</ul></nav>"
+            f"<header><p>Acme Corp - quality widgets since 1999</p></header>"
+            f"<main><h1>Product {i}</h1>{body}</main>"
+            f"<footer><p>Copyright Acme Corp. All rights reserved.</p></footer>"
+            f"</body></html>"
+        )
+        with open(os.path.join(root, f"page_{i}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+    shutil.copy(os.path.join(root, "page_0.html"), os.path.join(root, "index.html"))
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_site(root):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StubGeminiModel:
+    """
+    Stand-in for `genai.GenerativeModel` that answers instantly with a canned reply and usage.
+    """
+
+    async def generate_content_async(self, prompt, **kwargs):
+        from rag_pipeline.chunker import count_tokens
+
+        return SimpleNamespace(
+            text=STUB_ANSWER,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=count_tokens(prompt),
+                candidates_token_count=count_tokens(STUB_ANSWER)
+            )
+        )
+
+
+def recording_retrieve_context(retrieve_context, stages, counters, marks):
+    """
+    Wrap `retrieve_context` so the stage events `gemini_rag_pipeline` consumes are also timed.
+    """
+    async def recording(*args, **kwargs):
+        started = {}
+        async for event in retrieve_context(*args, **kwargs):
+            if event["event"] == "context":
+                marks["context"] = time.perf_counter()
+            elif event["status"] == "started":
+                started[event["stage"]] = event["elapsed"]
+            else:
+                stages[event["stage"]] = round(event["elapsed"] - started[event["stage"]], 4)
+                counters.update({k: v for k, v in event.items() if k not in {"event", "stage", "status", "elapsed"}})
+            yield event
+
+    return recording
+
+
+async def run_pipeline_once(base_url, max_links, engine):
+    from rag_pipeline import rag
+
+    stages, counters, marks = {}, {}, {}
+    retrieve_context = rag.retrieve_context
+    rag.retrieve_context = recording_retrieve_context(retrieve_context, stages, counters, marks)
+    try:
+        start = time.perf_counter()
+        _, usage = await rag.gemini_rag_pipeline(base_url, QUESTION, max_links, crawl_engine=engine)
+        end = time.perf_counter()
+    finally:
+        rag.retrieve_context = retrieve_context
+
+    # Prompt packing, the (stubbed) Gemini call and usage recording
+    if "context" in marks:
+        stages["generate"] = round(end - marks["context"], 4)
+    counters.update(usage or {})
+
+    total = end - start
+    result = {"total_seconds": round(total, 4), "stages": stages, "counters": counters}
+    if "crawl" in stages and stages["crawl"]:
+        result["pages_per_second"] = round(counters.get("pages", 0) / stages["crawl"], 2)
+    if "embed" in stages and stages["embed"]:
+        result["chunks_per_second"] = round(counters.get("embedded", 0) / stages["embed"], 2)
+    return result
+
+
+def run_configuration(base_url, max_links, concurrency, embedding_workers, cache_dir):
+    """
+    Run one configuration cold and warm; executed in a fresh process so RSS is per run.
+    """
+    from rag_pipeline import generator, rag
+    from rag_pipeline.cache import IndexCache
+    from rag_pipeline.crawler import CrawlEngine
+    from rag_pipeline.embedder import get_embedding_model
+
+    rag.index_cache = IndexCache(cache_dir=cache_dir)
+    # ask_gemini_async looks the model up through this function on every call
+    stub_model = StubGeminiModel()
+    generator.get_gemini_model = lambda *args, **kwargs: stub_model
+
+    load_start = time.perf_counter()
+    embedding_model = get_embedding_model()
+    if embedding_workers > 0:
+        embedding_model.start_pool(embedding_workers)
+    else:
+        embedding_model.load()
+    model_load_seconds = time.perf_counter() - load_start
+
+    async def main():
+        async with CrawlEngine(max_pages=concurrency) as engine:
+            cold = await run_pipeline_once(base_url, max_links, engine)
+            warm = await run_pipeline_once(base_url, max_links, engine)
+        return cold, warm
+
+    cold, warm = asyncio.run(main())
+    embedding_model.shutdown()
+
+    # ru_maxrss is in KiB on Linux; children covers the embedding worker processes
+    own_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "max_links": max_links,
+        "concurrency": concurrency,
+        "embedding_workers": embedding_workers,
+        "model_load_seconds": round(model_load_seconds, 4),
+        "cold": cold,
+        "warm": warm,
+        "peak_rss_mb": round(own_rss / 1024, 1),
+        "peak_children_rss_mb": round(children_rss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG pipeline against a local fixture site.")
+    parser.add_argument("--pages", type=int, default=20, help="Number of pages in the synthetic site")
+    parser.add_argument("--max-links", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--embedding-workers", type=int, default=0,
+                        help="Embedding worker processes (0 encodes in the benchmark process)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    site_dir = tempfile.mkdtemp(prefix="rag_bench_site_")
+    build_site(site_dir, args.pages)
+    server = serve_site(site_dir)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    runs = []
+    try:
+        for max_links in args.max_links:
+            for concurrency in args.concurrency:
+                cache_dir = tempfile.mkdtemp(prefix="rag_bench_cache_")
+                print(f"▶️ max_links={max_links} concurrency={concurrency}")
+                # A fresh process per configuration so model loading and peak RSS are measured per run
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    runs.append(pool.submit(
+                        run_configuration, base_url, max_links, concurrency, args.embedding_workers, cache_dir
+                    ).result())
+                shutil.rmtree(cache_dir, ignore_errors=True)
+    finally:
+        server.shutdown()
+        shutil.rmtree(site_dir, ignore_errors=True)
+
+    report = json.dumps({"pages": args.pages, "question": QUESTION, "runs": runs}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+        print(f"✅ Benchmark report written to {args.output}")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
-from .crawler import get_internal_links, load_docs_from_links
-from .embedder import get_embedding_model
-from .retriever import build_faiss_index
-from .generator import ask_gemini
-from .rag import gemini_rag_pipeline
\ No newline at end of file
+from .crawler import CrawlEngine, crawl_site, get_internal_links, load_docs_from_links
+from .embedder import EmbeddingService, get_embedding_model
+from .retriever import build_faiss_index, build_faiss_index_from_embeddings, update_faiss_index
+from .generator import ask_gemini, ask_gemini_async, ask_gemini_stream, build_prompt, get_gemini_model
+from .rag import gemini_rag_pipeline, gemini_rag_pipeline_stream, retrieve_context
+from .cache import IndexCache, make_cache_key
+from .jobs import JobQueue, QueueFullError
+from .chunker import chunk_blocks, count_tokens, find_boilerplate
+from .hybrid import BM25Index, HybridRetriever, get_hybrid_retriever
\ No newline at end of file
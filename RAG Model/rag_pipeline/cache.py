@@ -0,0 +1,179 @@
+# cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+from langchain.vectorstores import FAISS
+from langchain.schema import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+
+from .config import INDEX_CACHE_DIR, INDEX_CACHE_TTL_SECONDS, INDEX_CACHE_MAX_ENTRIES, INDEX_CACHE_MEMORY_ENTRIES
+
+INDEX_FILE = "index.faiss"
+DOCS_FILE = "docs.json"
+META_FILE = "meta.json"
+MANIFEST_FILE = "manifest.json"
+
+
+def make_cache_key(base_url, **settings):
+    """
+    Build a content-addressed key from the base URL and every setting that changes the index.
+    """
+    payload = json.dumps({"base_url": base_url.rstrip("/"), **settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IndexCache:
+    def __init__(self, cache_dir=INDEX_CACHE_DIR, ttl_seconds=INDEX_CACHE_TTL_SECONDS,
+                 max_entries=INDEX_CACHE_MAX_ENTRIES, memory_entries=INDEX_CACHE_MEMORY_ENTRIES):
+        """
+        On-disk cache of FAISS indexes with TTL expiry and LRU eviction.
+
+        Args:
+            cache_dir: Directory holding one sub-directory per cache key.
+            ttl_seconds: Age after which an entry is re-crawled and refreshed.
+            max_entries: Number of entries kept before the least recently used ones are evicted.
+            memory_entries: Number of fresh entries also kept loaded in memory.
+        """
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # key -> (created_at, vectorstore, manifest)
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _read_meta(self, key):
+        meta_path = os.path.join(self._entry_dir(key), META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry_dir, meta):
+        with open(os.path.join(entry_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def get(self, key, embedding_function):
+        """
+        Return `(vectorstore, manifest, expired)` for `key`, or None when there is no entry.
+
+        Expired entries are still returned so the caller can refresh them incrementally
+        using the per-URL `manifest` instead of rebuilding from scratch. They are always
+        loaded from disk, so the caller may modify them without affecting other readers.
+        """
+        with self._lock:
+            meta = self._read_meta(key)
+            if meta is None:
+                return None
+
+            expired = time.time() - meta["created_at"] > self.ttl_seconds
+            if expired:
+                print(f"⌛ Index cache entry expired for {meta.get('base_url')}")
+
+            entry_dir = self._entry_dir(key)
+            cached = self._memory.get(key)
+            if not expired and cached is not None and cached[0] == meta["created_at"]:
+                self._memory.move_to_end(key)
+                meta["last_access"] = time.time()
+                self._write_meta(entry_dir, meta)
+                return cached[1], cached[2], False
+
+            try:
+                index = faiss.read_index(os.path.join(entry_dir, INDEX_FILE))
+                with open(os.path.join(entry_dir, DOCS_FILE), "r", encoding="utf-8") as f:
+                    records = json.load(f)
+                manifest = {}
+                manifest_path = os.path.join(entry_dir, MANIFEST_FILE)
+                if os.path.exists(manifest_path):
+                    with open(manifest_path, "r", encoding="utf-8") as f:
+                        manifest = json.load(f)
+            except (OSError, RuntimeError, ValueError) as e:
+                print(f"[!] Dropping unreadable index cache entry {key}: {e}")
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                return None
+
+            # Touch the entry so LRU eviction keeps it around
+            meta["last_access"] = time.time()
+            self._write_meta(entry_dir, meta)
+
+        docstore = InMemoryDocstore({
+            record["id"]: Document(page_content=record["page_content"], metadata=record["metadata"])
+            for record in records
+        })
+        index_to_docstore_id = {i: record["id"] for i, record in enumerate(records)}
+
+        vectorstore = FAISS(
+            embedding_function=embedding_function,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+        if not expired:
+            with self._lock:
+                self._remember(key, meta["created_at"], vectorstore, manifest)
+        return vectorstore, manifest, expired
+
+    def _remember(self, key, created_at, vectorstore, manifest):
+        self._memory[key] = (created_at, vectorstore, manifest)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key, vectorstore, meta=None, manifest=None):
+        """
+        Persist a FAISS vector store (and its per-URL manifest) under `key`,
+        then evict entries over the size bound.
+        """
+        records = []
+        for i in range(vectorstore.index.ntotal):
+            doc_id = vectorstore.index_to_docstore_id[i]
+            doc = vectorstore.docstore.search(doc_id)
+            records.append({"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata})
+
+        now = time.time()
+        meta = dict(meta or {}, created_at=now, last_access=now)
+
+        with self._lock:
+            # Write into a temporary directory first so readers never see a half-written entry
+            entry_dir = self._entry_dir(key)
+            tmp_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+            os.makedirs(tmp_dir, exist_ok=True)
+            faiss.write_index(vectorstore.index, os.path.join(tmp_dir, INDEX_FILE))
+            with open(os.path.join(tmp_dir, DOCS_FILE), "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False)
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest or {}, f, ensure_ascii=False)
+            self._write_meta(tmp_dir, meta)
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            self._remember(key, meta["created_at"], vectorstore, manifest or {})
+
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            meta = self._read_meta(key)
+            if meta is None:
+                continue
+            entries.append((meta.get("last_access", 0), key))
+
+        entries.sort()
+        while len(entries) > self.max_entries:
+            _, key = entries.pop(0)
+            print(f"🧹 Evicting index cache entry {key}")
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            self._memory.pop(key, None)
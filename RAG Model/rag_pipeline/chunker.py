@@ -0,0 +1,114 @@
+# chunker.py
+
+import hashlib
+import re
+from collections import Counter
+from functools import lru_cache
+
+from transformers import AutoTokenizer
+
+from .config import CHUNK_TOKENIZER, CHUNK_MAX_TOKENS, BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_RATIO
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    return AutoTokenizer.from_pretrained(CHUNK_TOKENIZER)
+
+
+def count_tokens(text):
+    return len(get_tokenizer().encode(text, add_special_tokens=False))
+
+
+def block_hash(text):
+    normalized = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def blocks_from_text(text):
+    """
+    Fallback for pages whose text does not live in semantic elements: one block per line.
+    """
+    return [{"tag": "p", "text": line.strip()} for line in text.splitlines() if line.strip()]
+
+
+def find_boilerplate(pages_block_hashes):
+    """
+    Return the block hashes that repeat across enough pages to be navigation or footer text.
+
+    Args:
+        pages_block_hashes: One list of block hashes per crawled page.
+    """
+    page_count = len(pages_block_hashes)
+    if page_count < BOILERPLATE_MIN_PAGES:
+        return set()
+
+    threshold = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_RATIO * page_count)
+    counts = Counter(h for hashes in pages_block_hashes for h in set(hashes))
+    return {h for h, count in counts.items() if count >= threshold}
+
+
+def _split_by_tokens(text, max_tokens):
+    # Cut an oversized block on token boundaries, mapped back to character offsets
+    encoding = get_tokenizer()(text, add_special_tokens=False, return_offsets_mapping=True)
+    offsets = encoding["offset_mapping"]
+    pieces = []
+    for start in range(0, len(offsets), max_tokens):
+        window = offsets[start:start + max_tokens]
+        pieces.append(text[window[0][0]:window[-1][1]].strip())
+    return [piece for piece in pieces if piece]
+
+
+def chunk_blocks(blocks, boilerplate=frozenset(), max_tokens=CHUNK_MAX_TOKENS):
+    """
+    Group DOM blocks into chunks of at most `max_tokens` tokens without crossing headings.
+
+    Every chunk starts with the heading path it belongs to (e.g. "Pricing > Enterprise"),
+    and blocks whose hash is in `boilerplate` are dropped.
+    """
+    chunks = []
+    headings = []
+    current = []
+    current_tokens = 0
+
+    def section_title():
+        return " > ".join(text for _, text in headings)
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            title = section_title()
+            chunks.append("\n".join([title] + current) if title else "\n".join(current))
+        current = []
+        current_tokens = 0
+
+    for block in blocks:
+        text = block["text"].strip()
+        if not text or block_hash(text) in boilerplate:
+            continue
+
+        if block["tag"] in HEADING_TAGS:
+            # A new heading closes the current section and replaces same-or-deeper headings
+            flush()
+            level = int(block["tag"][1])
+            headings = [(lvl, heading) for lvl, heading in headings if lvl < level]
+            headings.append((level, text))
+            continue
+
+        budget = max_tokens - count_tokens(section_title())
+        tokens = count_tokens(text)
+        if tokens > budget:
+            flush()
+            for piece in _split_by_tokens(text, max(budget, 1)):
+                current = [piece]
+                flush()
+            continue
+
+        if current_tokens + tokens > budget:
+            flush()
+        current.append(text)
+        current_tokens += tokens
+
+    flush()
+    return chunks
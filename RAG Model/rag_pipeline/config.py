@@ -0,0 +1,56 @@
+# config.py
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Embedding model used for every index built by the pipeline
+EMBEDDING_MODEL_NAME = os.getenv("RAG_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Chunking configuration (sizes are in embedding-model tokens; all-MiniLM-L6-v2 truncates at 256)
+CHUNK_TOKENIZER = os.getenv("RAG_CHUNK_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")
+CHUNK_MAX_TOKENS = int(os.getenv("RAG_CHUNK_MAX_TOKENS", 200))
+
+# A block is boilerplate (nav, footer, cookie banner...) when it repeats on this share of pages
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_PAGE_RATIO = 0.5
+
+# Number of chunks retrieved as candidates for the Gemini context
+TOP_K = 8
+
+# Hybrid retrieval: candidates taken from each of FAISS and BM25, fused with reciprocal rank fusion
+HYBRID_CANDIDATES = 20
+RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Gemini generation
+GEMINI_MODEL_NAME = os.getenv("RAG_GEMINI_MODEL", "gemini-1.5-flash")
+# Tokens of retrieved context packed into a prompt (counted with CHUNK_TOKENIZER)
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_PROMPT_CONTEXT_TOKEN_BUDGET", 1500))
+# Chunks sharing at least this fraction of their words with an already packed chunk are skipped
+PROMPT_DEDUP_OVERLAP = 0.8
+
+# On-disk index cache (one entry per base_url + crawl settings)
+INDEX_CACHE_DIR = os.getenv("RAG_INDEX_CACHE_DIR", "storage/index_cache")
+INDEX_CACHE_TTL_SECONDS = int(os.getenv("RAG_INDEX_CACHE_TTL_SECONDS", 24 * 60 * 60))
+INDEX_CACHE_MAX_ENTRIES = int(os.getenv("RAG_INDEX_CACHE_MAX_ENTRIES", 20))
+# Fresh entries also kept loaded in memory, so hits skip disk reads and keep their BM25 index
+INDEX_CACHE_MEMORY_ENTRIES = int(os.getenv("RAG_INDEX_CACHE_MEMORY_ENTRIES", 4))
+
+# Crawler configuration
+CRAWL_CONCURRENCY = int(os.getenv("RAG_CRAWL_CONCURRENCY", 8))  # pages open at once
+CRAWL_PER_HOST_LIMIT = int(os.getenv("RAG_CRAWL_PER_HOST_LIMIT", 4))  # in-flight requests per host
+PAGE_TIMEOUT_MS = 10000
+NETWORK_IDLE_TIMEOUT_MS = 5000
+
+# Number of texts sent to the embedding model per encode batch
+EMBEDDING_BATCH_SIZE = int(os.getenv("RAG_EMBEDDING_BATCH_SIZE", 64))
+
+# Worker processes used for document embedding (0 encodes on a thread in the API process)
+EMBEDDING_PROCESS_WORKERS = int(os.getenv("RAG_EMBEDDING_PROCESS_WORKERS", 2))
+
+# Admission control for /ask: pipelines running at once and requests allowed to wait for a slot
+MAX_RUNNING_JOBS = int(os.getenv("RAG_MAX_RUNNING_JOBS", 4))
+MAX_PENDING_JOBS = int(os.getenv("RAG_MAX_PENDING_JOBS", 16))
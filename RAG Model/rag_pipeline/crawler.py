@@ -1,82 +1,259 @@
-from urllib.parse import urljoin, urlparse
+import asyncio
+import hashlib
+from collections import defaultdict
+from urllib.parse import urljoin, urlparse, urldefrag
 import tldextract
 from langchain.schema import Document
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+from .config import CRAWL_CONCURRENCY, CRAWL_PER_HOST_LIMIT, PAGE_TIMEOUT_MS, NETWORK_IDLE_TIMEOUT_MS
+
+# Collects visible text, structural blocks and every link in a single round trip to the browser.
+# Blocks are outermost text elements in document order; nav and footer are skipped outright.
+EXTRACT_PAGE_JS = """
+() => {
+    const selector = "h1, h2, h3, h4, h5, h6, p, li, pre, blockquote, td, th, dt, dd, figcaption";
+    const blocks = [];
+    for (const el of document.querySelectorAll(selector)) {
+        if (el.closest("nav, footer") || (el.parentElement && el.parentElement.closest(selector))) {
+            continue;
+        }
+        const text = el.innerText ? el.innerText.trim() : "";
+        if (text) {
+            blocks.push({tag: el.tagName.toLowerCase(), text: text});
+        }
+    }
+    return {
+        text: document.body ? document.body.innerText : "",
+        blocks: blocks,
+        links: Array.from(document.querySelectorAll("a[href]"), a => a.href)
+    };
+}
+"""
+
 
 def normalize_url(base_url, link):
-    return urljoin(base_url, link)
+    # Drop #fragments so the same page is not crawled twice
+    return urldefrag(urljoin(base_url, link))[0]
 
 def is_internal(base_domain, link_url):
     link_domain = tldextract.extract(link_url).domain
     return base_domain == link_domain
 
-def get_internal_links(base_url, max_links=20):
-    visited = set()
-    to_visit = [base_url]
-    base_domain = tldextract.extract(base_url).domain
-    internal_links = []
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
 
-        while to_visit and len(internal_links) < max_links:
-            url = to_visit.pop(0)
-            if url in visited:
-                continue
+class CrawlEngine:
+    def __init__(self, max_pages=CRAWL_CONCURRENCY, per_host_limit=CRAWL_PER_HOST_LIMIT):
+        """
+        Async crawler that shares one Chromium between all crawls.
 
-            try:
-                page.goto(url, timeout=10000)
-                page.wait_for_load_state("networkidle", timeout=5000)
-
-                visited.add(url)
-                anchors = page.query_selector_all("a[href]")
-                for anchor in anchors:
-                    href = anchor.get_attribute("href")
-                    if not href:
-                        continue
-                    full_url = normalize_url(url, href)
-                    parsed = urlparse(full_url)
-                    if parsed.scheme in {"http", "https"} and is_internal(base_domain, full_url):
-                        if full_url not in visited and full_url not in internal_links:
-                            internal_links.append(full_url)
-                            to_visit.append(full_url)
-            except Exception as e:
-                print(f"[!] Failed to crawl {url}: {e}")
-                continue
+        Args:
+            max_pages: How many pages are open at once, across all crawls.
+            per_host_limit: Maximum number of in-flight page loads against a single host.
+        """
+        self.max_pages = max_pages
+        self.per_host_limit = per_host_limit
+        self._playwright = None
+        self._browser = None
+        self._page_slots = asyncio.Semaphore(max_pages)
+        self._host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
 
-        browser.close()
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        return self
 
-    return internal_links[:max_links]
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
 
-def load_docs_from_links(links):
-    docs = []
-    # Start Playwright session
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-
-        # Loop through the links and scrape the data
-        for url in links:
-            try:
-                print(f"Visiting: {url}")
-                # Go to the URL
-                page.goto(url, timeout=10000)
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _is_not_modified(self, page, url, previous):
+        """
+        Revalidate a previously crawled URL with its HTTP validators, without rendering it.
+        """
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+        if not headers:
+            return False
 
-                # Wait for the page to load and for all network requests to complete
-                page.wait_for_load_state("networkidle", timeout=5000)
+        try:
+            response = await page.context.request.get(url, headers=headers, timeout=PAGE_TIMEOUT_MS)
+            not_modified = response.status == 304
+            await response.dispose()
+            return not_modified
+        except Exception:
+            return False
 
-                # Capture all visible text content from the page
-                visible_text = page.inner_text("body")
+    async def fetch_page(self, url, previous=None, context=None):
+        """
+        Load a single URL, or None when it fails.
 
-                # Add this document to the list
-                docs.append(Document(page_content=visible_text, metadata={"source": url}))
+        The page is opened in `context` (the browser context of the current crawl) and closed
+        afterwards, so a page whose target crashed is never handed to another load. Without
+        a `context`, the URL is loaded in a context of its own.
+
+        Returns a record with the visible `text`, its structural `blocks` (`{"tag", "text"}` in
+        document order), outgoing `links`, a `content_hash` of the text
+        and the `etag`/`last_modified` validators. When `previous` (the record from an earlier
+        crawl) is still valid according to the server, its links are reused and `text` is None.
+        """
+        if context is None:
+            context = await self._browser.new_context()
+            try:
+                return await self.fetch_page(url, previous, context)
+            finally:
+                await context.close()
+
+        host = urlparse(url).netloc
+        async with self._host_limits[host], self._page_slots:
+            page = None
+            try:
+                page = await context.new_page()
+                if previous and await self._is_not_modified(page, url, previous):
+                    print(f"Not modified: {url}")
+                    return dict(previous, text=None)
+
+                print(f"Visiting: {url}")
+                response = await page.goto(url, timeout=PAGE_TIMEOUT_MS)
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=NETWORK_IDLE_TIMEOUT_MS)
+                except PlaywrightTimeoutError:
+                    # Pages with long-polling never go idle; use what has rendered so far
+                    pass
 
+                result = await page.evaluate(EXTRACT_PAGE_JS)
+                headers = response.headers if response is not None else {}
+                return {
+                    "text": result["text"],
+                    "blocks": result["blocks"],
+                    "links": result["links"],
+                    "content_hash": hash_text(result["text"]),
+                    "etag": headers.get("etag"),
+                    "last_modified": headers.get("last-modified"),
+                }
             except Exception as e:
                 print(f"[!] Failed to load {url}: {e}")
-                continue
+                return None
+            finally:
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception:
+                        # The target is already gone
+                        pass
 
-        # Close the browser after crawling
-        browser.close()
+    async def crawl_pages(self, base_url, max_links=20, previous=None):
+        """
+        Discover internal links and extract page text in a single pass.
+
+        Up to `max_links` pages (including `base_url`) are visited, `max_pages` at a time.
+        `previous` maps URLs to the records of an earlier crawl, which are revalidated
+        instead of re-rendered where the server supports it.
+
+        Returns a dict of URL -> page record (see `fetch_page`) in discovery order.
+        """
+        # A fresh browser context per crawl so cookies and storage do not leak between crawls
+        context = await self._browser.new_context()
+        try:
+            return await self._crawl_pages(context, base_url, max_links, previous or {})
+        finally:
+            await context.close()
+
+    async def _crawl_pages(self, context, base_url, max_links, previous):
+        base_domain = tldextract.extract(base_url).domain
+        discovered = [base_url]
+        seen = {base_url}
+        pages = {}
+        queue = asyncio.Queue()
+        queue.put_nowait(base_url)
+
+        async def worker():
+            while True:
+                url = await queue.get()
+                try:
+                    record = await self.fetch_page(url, previous.get(url), context)
+                    if record is None:
+                        continue
+
+                    pages[url] = record
+                    for href in record["links"]:
+                        full_url = normalize_url(url, href)
+                        parsed = urlparse(full_url)
+                        if len(seen) >= max_links:
+                            break
+                        if parsed.scheme in {"http", "https"} and is_internal(base_domain, full_url):
+                            if full_url not in seen:
+                                seen.add(full_url)
+                                discovered.append(full_url)
+                                queue.put_nowait(full_url)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_pages)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        return {url: pages[url] for url in discovered if url in pages}
+
+    async def crawl(self, base_url, max_links=20):
+        """
+        Crawl a site and return one Document per page, in discovery order.
+        """
+        pages = await self.crawl_pages(base_url, max_links)
+        return [
+            Document(page_content=record["text"], metadata={"source": url})
+            for url, record in pages.items()
+        ]
+
+    async def load(self, links):
+        """
+        Extract the visible text of a fixed list of links concurrently.
+        """
+        context = await self._browser.new_context()
+        try:
+            records = await asyncio.gather(*(self.fetch_page(url, context=context) for url in links))
+        finally:
+            await context.close()
+        return [
+            Document(page_content=record["text"], metadata={"source": url})
+            for url, record in zip(links, records) if record is not None
+        ]
+
+
+async def crawl_site(base_url, max_links=20, engine=None, previous=None):
+    # Reuse a long-lived engine when the caller has one, otherwise start a browser for this crawl
+    if engine is not None:
+        return await engine.crawl_pages(base_url, max_links, previous)
+    async with CrawlEngine() as engine:
+        return await engine.crawl_pages(base_url, max_links, previous)
+
+
+def get_internal_links(base_url, max_links=20):
+    pages = asyncio.run(crawl_site(base_url, max_links))
+    return list(pages)
+
+def load_docs_from_links(links):
+    async def _load():
+        async with CrawlEngine() as engine:
+            return await engine.load(links)
 
-    return docs
\ No newline at end of file
+    return asyncio.run(_load())
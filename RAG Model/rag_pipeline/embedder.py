@@ -1,4 +1,154 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain.embeddings.base import Embeddings
 from sentence_transformers import SentenceTransformer
 
+from .config import EMBEDDING_MODEL_NAME, EMBEDDING_BATCH_SIZE, EMBEDDING_PROCESS_WORKERS
+
+# Model owned by each embedding worker process, loaded once by the pool initializer
+_worker_model = None
+
+
+def _init_worker(model_name):
+    global _worker_model
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_in_worker(texts, batch_size):
+    vectors = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return vectors.tolist()
+
+
+class EmbeddingService(Embeddings):
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, batch_size=EMBEDDING_BATCH_SIZE):
+        """
+        Process-wide SentenceTransformer wrapper that loads the model once and batches encode calls.
+
+        Args:
+            model_name: SentenceTransformer model to load.
+            batch_size: Number of texts encoded per forward pass.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "load_seconds": 0.0,
+            "encode_calls": 0,
+            "texts_encoded": 0,
+            "encode_seconds": 0.0,
+        }
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = SentenceTransformer(self.model_name)
+                    self._metrics["load_seconds"] = time.perf_counter() - start
+                    print(f"✅ Loaded embedding model {self.model_name} in {self._metrics['load_seconds']:.2f}s")
+        return self._model
+
+    def start_pool(self, workers=EMBEDDING_PROCESS_WORKERS):
+        """
+        Start the worker processes used by `aencode` and load the model in each of them.
+        """
+        if workers <= 0 or self._pool is not None:
+            return
+        start = time.perf_counter()
+        # spawn, not fork: forking a process that already imported torch is unsafe
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name,)
+        )
+        # Run one tiny encode per worker so the first request does not pay for model loading
+        warmups = [self._pool.submit(_encode_in_worker, ["warmup"], 1) for _ in range(workers)]
+        for future in warmups:
+            future.result()
+        self._metrics["load_seconds"] = time.perf_counter() - start
+        print(f"✅ Started {workers} embedding workers in {self._metrics['load_seconds']:.2f}s")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _record(self, texts, elapsed):
+        with self._lock:
+            self._metrics["encode_calls"] += 1
+            self._metrics["texts_encoded"] += len(texts)
+            self._metrics["encode_seconds"] += elapsed
+
+    def encode(self, texts):
+        model = self.load()
+        start = time.perf_counter()
+        vectors = model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        self._record(texts, time.perf_counter() - start)
+        return vectors.tolist()
+
+    async def aencode(self, texts):
+        """
+        Encode without blocking the event loop, on the worker pool when it is running.
+        """
+        if self._pool is None:
+            return await asyncio.to_thread(self.encode, texts)
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        vectors = await loop.run_in_executor(self._pool, _encode_in_worker, texts, self.batch_size)
+        self._record(texts, time.perf_counter() - start)
+        return vectors
+
+    def embed_documents(self, texts):
+        return self.encode(texts)
+
+    def embed_query(self, text):
+        return self.encode([text])[0]
+
+    async def aembed_documents(self, texts):
+        return await self.aencode(texts)
+
+    async def aembed_query(self, text):
+        return (await self.aencode([text]))[0]
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["model"] = self.model_name
+        metrics["batch_size"] = self.batch_size
+        metrics["loaded"] = self._model is not None or self._pool is not None
+        metrics["process_workers"] = self._pool._max_workers if self._pool is not None else 0
+        metrics["texts_per_second"] = (
+            metrics["texts_encoded"] / metrics["encode_seconds"] if metrics["encode_seconds"] else 0.0
+        )
+        return metrics
+
+
+_embedding_service = None
+_embedding_service_lock = threading.Lock()
+
+
 def get_embedding_model():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    global _embedding_service
+    if _embedding_service is None:
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
+    return _embedding_service
@@ -1,20 +1,133 @@
 from dotenv import load_dotenv
 import os
+import re
+import threading
+from functools import lru_cache
 import google.generativeai as genai
 
+from .chunker import count_tokens
+from .config import GEMINI_MODEL_NAME, PROMPT_CONTEXT_TOKEN_BUDGET, PROMPT_DEDUP_OVERLAP
+
 load_dotenv()
 genai.configure(api_key=os.getenv("GENAI_KEY"))
 
-def ask_gemini(query, context_docs):
-    prompt = f"""You are a helpful assistant. Use the following context to answer the question.
+PROMPT_TEMPLATE = """You are a helpful assistant. Use the following context to answer the question.
 
             Context:
-            {context_docs}
+            {context}
 
             Question:
             {query}
             """
 
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    response = model.generate_content(prompt)
-    return response.text
+_usage_lock = threading.Lock()
+_usage_totals = {"requests": 0, "prompt_tokens": 0, "response_tokens": 0}
+
+
+@lru_cache(maxsize=None)
+def get_gemini_model(model_name=GEMINI_MODEL_NAME):
+    return genai.GenerativeModel(model_name)
+
+def _words(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+def pack_context(context_docs, token_budget=PROMPT_CONTEXT_TOKEN_BUDGET):
+    """
+    Pick chunks in rank order until `token_budget` is spent, skipping overlapping ones.
+
+    Args:
+        context_docs: Ranked Documents (or plain strings), best match first.
+        token_budget: Maximum number of context tokens.
+
+    Returns:
+        (texts, tokens): the packed chunk texts and their total token count.
+    """
+    packed, packed_words = [], []
+    used = 0
+    for doc in context_docs:
+        text = (doc.page_content if hasattr(doc, "page_content") else doc).strip()
+        if not text:
+            continue
+
+        # Drop exact duplicates and chunks mostly contained in one already packed
+        words = _words(text)
+        if any(
+            text in kept or (words and len(words & kept_words) / len(words) >= PROMPT_DEDUP_OVERLAP)
+            for kept, kept_words in zip(packed, packed_words)
+        ):
+            continue
+
+        tokens = count_tokens(text)
+        if used + tokens > token_budget:
+            continue
+        packed.append(text)
+        packed_words.append(words)
+        used += tokens
+    return packed, used
+
+def build_prompt(query, context_docs, token_budget=PROMPT_CONTEXT_TOKEN_BUDGET):
+    texts, context_tokens = pack_context(context_docs, token_budget)
+    prompt = PROMPT_TEMPLATE.format(context="\n\n".join(texts), query=query)
+    return prompt, {"context_chunks": len(texts), "context_tokens": context_tokens}
+
+def record_usage(stats, usage_metadata):
+    """
+    Merge Gemini's reported token counts into `stats` and the process-wide totals.
+    """
+    usage = dict(stats)
+    usage["prompt_tokens"] = getattr(usage_metadata, "prompt_token_count", 0) or 0
+    usage["response_tokens"] = getattr(usage_metadata, "candidates_token_count", 0) or 0
+    with _usage_lock:
+        _usage_totals["requests"] += 1
+        _usage_totals["prompt_tokens"] += usage["prompt_tokens"]
+        _usage_totals["response_tokens"] += usage["response_tokens"]
+    print(f"🧾 Gemini usage: {usage}")
+    return usage
+
+def get_usage_totals():
+    with _usage_lock:
+        return dict(_usage_totals)
+
+def chunk_text(chunk):
+    """
+    Text of a streamed response chunk, or "" when it has none.
+
+    `chunk.text` raises ValueError for chunks without text parts (a safety block or a
+    finish-only chunk), which would abort a stream that has already started.
+    """
+    texts = []
+    for candidate in getattr(chunk, "candidates", None) or []:
+        content = getattr(candidate, "content", None)
+        for part in getattr(content, "parts", None) or []:
+            texts.append(getattr(part, "text", "") or "")
+    return "".join(texts)
+
+def ask_gemini(query, context_docs):
+    prompt, stats = build_prompt(query, context_docs)
+
+    response = get_gemini_model().generate_content(prompt)
+    return response.text, record_usage(stats, response.usage_metadata)
+
+async def ask_gemini_async(query, context_docs):
+    prompt, stats = build_prompt(query, context_docs)
+
+    response = await get_gemini_model().generate_content_async(prompt)
+    return response.text, record_usage(stats, response.usage_metadata)
+
+async def ask_gemini_stream(query, context_docs, usage=None):
+    """
+    Yield the answer piece by piece as Gemini generates it.
+
+    When a dict is passed as `usage` it is filled with the token usage once the stream ends.
+    """
+    prompt, stats = build_prompt(query, context_docs)
+
+    response = await get_gemini_model().generate_content_async(prompt, stream=True)
+    async for chunk in response:
+        text = chunk_text(chunk)
+        if text:
+            yield text
+
+    recorded = record_usage(stats, response.usage_metadata)
+    if usage is not None:
+        usage.update(recorded)
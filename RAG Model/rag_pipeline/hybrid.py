@@ -0,0 +1,115 @@
+# hybrid.py
+
+import math
+import re
+import threading
+import weakref
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from .config import TOP_K, HYBRID_CANDIDATES, RRF_K, BM25_K1, BM25_B
+
+# Keeps codes such as "PRD-003" or "ERR_42" together as one term
+TERM_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+
+def tokenize(text):
+    terms = []
+    for term in TERM_RE.findall(text.lower()):
+        terms.append(term)
+        # Also index the parts of compound codes so "003" alone still matches "prd-003"
+        parts = re.split(r"[-_.]", term)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        """
+        In-memory inverted index scored with Okapi BM25.
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self.doc_lengths = {}
+        self.total_length = 0
+
+    def add(self, doc_id, text):
+        terms = tokenize(text)
+        for term, freq in Counter(terms).items():
+            self.postings[term][doc_id] = freq
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+
+    def search(self, query, k=HYBRID_CANDIDATES):
+        """
+        Return up to `k` `(doc_id, score)` pairs, best first.
+        """
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return []
+        avg_length = self.total_length / doc_count
+
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, freq in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class HybridRetriever:
+    def __init__(self, vectorstore):
+        """
+        Dense FAISS search fused with BM25 over the same chunks.
+
+        Args:
+            vectorstore: LangChain FAISS vector store; its docstore is indexed for BM25.
+        """
+        self.vectorstore = vectorstore
+        self.bm25 = BM25Index()
+        for doc_id in vectorstore.index_to_docstore_id.values():
+            self.bm25.add(doc_id, vectorstore.docstore.search(doc_id).page_content)
+
+    def _dense_search(self, query_embedding, k):
+        vector = np.array([query_embedding], dtype=np.float32)
+        _, indices = self.vectorstore.index.search(vector, k)
+        return [self.vectorstore.index_to_docstore_id[i] for i in indices[0] if i != -1]
+
+    def search(self, query, query_embedding, k=TOP_K, candidates=HYBRID_CANDIDATES):
+        """
+        Return the top `k` Documents by reciprocal rank fusion of dense and BM25 rankings.
+        """
+        rankings = [
+            self._dense_search(query_embedding, candidates),
+            [doc_id for doc_id, _ in self.bm25.search(query, candidates)],
+        ]
+
+        fused = defaultdict(float)
+        for ranking in rankings:
+            for rank, doc_id in enumerate(ranking):
+                fused[doc_id] += 1.0 / (RRF_K + rank + 1)
+
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        return [self.vectorstore.docstore.search(doc_id) for doc_id in best]
+
+
+# One retriever per loaded vector store, dropped together with it
+_retrievers = weakref.WeakKeyDictionary()
+_retrievers_lock = threading.Lock()
+
+
+def get_hybrid_retriever(vectorstore):
+    with _retrievers_lock:
+        retriever = _retrievers.get(vectorstore)
+        if retriever is None:
+            retriever = HybridRetriever(vectorstore)
+            _retrievers[vectorstore] = retriever
+        return retriever
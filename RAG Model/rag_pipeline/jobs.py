@@ -0,0 +1,61 @@
+# jobs.py
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from .config import MAX_RUNNING_JOBS, MAX_PENDING_JOBS
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, max_running=MAX_RUNNING_JOBS, max_pending=MAX_PENDING_JOBS):
+        """
+        FIFO admission control for pipeline runs.
+
+        Args:
+            max_running: Number of pipelines allowed to run at once.
+            max_pending: Number of requests allowed to wait for a free slot; more are rejected.
+        """
+        self.max_running = max_running
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_running)
+        self._running = 0
+        self._pending = 0
+        self._rejected = 0
+
+    def is_full(self):
+        return self._running >= self.max_running and self._pending >= self.max_pending
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Wait for a free slot, raising QueueFullError straight away when the queue is full.
+        """
+        if self.is_full():
+            self._rejected += 1
+            raise QueueFullError(f"Too many requests in flight ({self._running} running, {self._pending} waiting)")
+
+        self._pending += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._pending -= 1
+
+        self._running += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    def get_stats(self):
+        return {
+            "running": self._running,
+            "pending": self._pending,
+            "rejected": self._rejected,
+            "max_running": self.max_running,
+            "max_pending": self.max_pending,
+        }
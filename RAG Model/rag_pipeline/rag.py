@@ -1,40 +1,204 @@
-from .crawler import get_internal_links, load_docs_from_links
+import asyncio
+import time
+
+from .crawler import crawl_site, hash_text
 from .embedder import get_embedding_model
-from .retriever import build_faiss_index
-from .generator import ask_gemini
-from langchain.text_splitter import CharacterTextSplitter
+from .retriever import build_faiss_index_from_embeddings, update_faiss_index
+from .generator import ask_gemini_async, ask_gemini_stream
+from .cache import IndexCache, make_cache_key
+from .hybrid import get_hybrid_retriever
+from .chunker import chunk_blocks, block_hash, blocks_from_text, find_boilerplate
+from .config import EMBEDDING_MODEL_NAME, CHUNK_TOKENIZER, CHUNK_MAX_TOKENS, TOP_K
+
+index_cache = IndexCache()
+
+NO_CONTENT_ANSWER = "No content found to answer your question."
+
+
+def chunk_pages(pages, changed, manifest):
+    """
+    Chunk the `changed` pages of a crawl and build the new per-URL manifest.
+
+    Returns `(manifest, texts, metadatas, ids, boilerplate)` where texts/metadatas/ids
+    describe the new chunks only.
+    """
+    page_blocks = {}
+    for url, page in pages.items():
+        if page["text"] is None:
+            continue
+        blocks = page["blocks"]
+        # Fall back to plain lines when most of the text is outside semantic elements
+        if sum(len(block["text"]) for block in blocks) < 0.5 * len(page["text"]):
+            blocks = blocks_from_text(page["text"])
+        page_blocks[url] = blocks
 
+    # Pages revalidated with a 304 contribute the block hashes recorded on the previous crawl
+    block_hashes = {
+        url: [block_hash(block["text"]) for block in page_blocks[url]] if url in page_blocks
+        else page.get("block_hashes", [])
+        for url, page in pages.items()
+    }
+    boilerplate = find_boilerplate(list(block_hashes.values()))
 
-def gemini_rag_pipeline(base_url, question, max_links=10):
-    # Fetch internal links from base_url
-    links = get_internal_links(base_url, max_links)
-    # Load documents from those links
-    docs = load_docs_from_links(links)
+    new_manifest = {}
+    texts, metadatas, ids = [], [], []
+    for url, page in pages.items():
+        record = {
+            "content_hash": page["content_hash"],
+            "etag": page["etag"],
+            "last_modified": page["last_modified"],
+            "links": page["links"],
+            "block_hashes": block_hashes[url],
+            "chunk_ids": manifest.get(url, {}).get("chunk_ids", []),
+        }
+        if url in changed:
+            url_hash = hash_text(url)[:16]
+            chunks = chunk_blocks(page_blocks[url], boilerplate)
+            record["chunk_ids"] = [f"{url_hash}-{page['content_hash'][:16]}-{i}" for i in range(len(chunks))]
+            texts.extend(chunks)
+            metadatas.extend({"source": url} for _ in chunks)
+            ids.extend(record["chunk_ids"])
+        new_manifest[url] = record
 
-    # Split the documents into smaller chunks
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    split_docs = splitter.split_documents(docs)
+    return new_manifest, texts, metadatas, ids, boilerplate
 
-    # Create list of chunked texts for embedding
-    split_texts = [doc.page_content for doc in split_docs]
 
-    # Inspect the first 500 characters of each chunked document
-    print("\n=== CHUNKED DOCUMENTS LOADED ===")
-    for i, text in enumerate(split_texts):
-        print(f"\n--- Document {i + 1} ---\n{text[:500]}...\n")
+async def retrieve_context(base_url, question, max_links=10, crawl_engine=None):
+    """
+    Run every stage up to retrieval, yielding a progress event as each stage starts and ends.
 
-    if not split_texts:
-        return "No content found to answer your question."
+    The last event is `{"event": "context", ...}` carrying the ranked context Documents,
+    or None when the site had no usable text.
+    """
+    start = time.perf_counter()
 
-    # Get the embedding model
+    def event(name, **data):
+        return {"event": name, "elapsed": round(time.perf_counter() - start, 3), **data}
+
+    # Reuse a previously built index for the same site and crawl settings
+    yield event("stage", stage="cache", status="started")
+    cache_key = make_cache_key(
+        base_url,
+        max_links=max_links,
+        chunker="blocks-v1",
+        chunk_tokenizer=CHUNK_TOKENIZER,
+        chunk_max_tokens=CHUNK_MAX_TOKENS,
+        embedding_model=EMBEDDING_MODEL_NAME
+    )
     embedding_model = get_embedding_model()
+    entry = await asyncio.to_thread(index_cache.get, cache_key, embedding_model)
+    index, manifest, expired = entry if entry is not None else (None, {}, True)
+    if not manifest:
+        # Without a per-URL manifest the old vectors cannot be matched to pages; re-crawl and rebuild
+        index, expired = None, True
+    yield event("stage", stage="cache", status="done", hit=not expired)
+
+    if not expired:
+        print(f"✅ Index cache hit for {base_url}")
+    else:
+        # Discover internal links and load their text in a single concurrent pass,
+        # revalidating pages from the previous crawl instead of re-rendering them
+        yield event("stage", stage="crawl", status="started")
+        pages = await crawl_site(base_url, max_links, engine=crawl_engine, previous=manifest)
+        changed = [
+            url for url, page in pages.items()
+            if page["text"] is not None and page["content_hash"] != manifest.get(url, {}).get("content_hash")
+        ]
+        removed = [url for url in manifest if url not in pages or url in changed]
+        yield event("stage", stage="crawl", status="done", pages=len(pages), changed=len(changed), removed=len(removed))
+
+        # Split only new or changed pages into token-sized chunks along their headings,
+        # dropping blocks repeated across the site (navigation, footers, banners)
+        yield event("stage", stage="chunk", status="started")
+        new_manifest, split_texts, split_metadatas, split_ids, boilerplate = await asyncio.to_thread(
+            chunk_pages, pages, changed, manifest
+        )
+        yield event("stage", stage="chunk", status="done", chunks=len(split_texts), boilerplate_blocks=len(boilerplate))
+
+        # Inspect the first 500 characters of each chunked document
+        print("\n=== CHUNKED DOCUMENTS LOADED ===")
+        for i, text in enumerate(split_texts):
+            print(f"\n--- Document {i + 1} ---\n{text[:500]}...\n")
+
+        if index is None and not split_texts:
+            yield event("context", context=None)
+            return
+
+        # Embed the new chunks off the event loop
+        yield event("stage", stage="embed", status="started")
+        vectors = await embedding_model.aembed_documents(split_texts) if split_texts else []
+        yield event("stage", stage="embed", status="done", embedded=len(split_texts))
 
-    # Build the FAISS index using the chunked texts
-    index = build_faiss_index(split_texts, embedding_model)
+        # Upsert the new vectors, drop those of changed or removed pages, and save the index
+        # so repeat questions skip crawling and embedding
+        yield event("stage", stage="index", status="started")
+        if index is None:
+            index = build_faiss_index_from_embeddings(
+                split_texts, vectors, embedding_model, split_metadatas, split_ids
+            )
+        else:
+            delete_ids = [chunk_id for url in removed for chunk_id in manifest[url].get("chunk_ids", [])]
+            index = update_faiss_index(index, split_texts, vectors, split_metadatas, split_ids, delete_ids)
+
+        if index.index.ntotal == 0:
+            yield event("context", context=None)
+            return
+
+        await asyncio.to_thread(
+            index_cache.put, cache_key, index, {"base_url": base_url, "max_links": max_links}, new_manifest
+        )
+        yield event("stage", stage="index", status="done", vectors=index.index.ntotal)
 
     # Perform similarity search to find relevant documents
-    similar_docs = index.similarity_search(question, k=5)
-    context = "\n\n".join(doc.page_content for doc in similar_docs)
+    yield event("stage", stage="search", status="started")
+    query_embedding = await embedding_model.aembed_query(question)
+    # Dense search fused with BM25 so exact terms (product codes, error IDs) are not missed
+    retriever = await asyncio.to_thread(get_hybrid_retriever, index)
+    similar_docs = retriever.search(question, query_embedding, k=TOP_K)
+    yield event("stage", stage="search", status="done", results=len(similar_docs))
+
+    yield event("context", context=similar_docs)
+
+
+async def gemini_rag_pipeline(base_url, question, max_links=10, crawl_engine=None):
+    """
+    Answer `question` from the content of `base_url`.
+
+    Returns `(answer, usage)` where usage holds the prompt/response token counts, or None
+    when Gemini was not called.
+    """
+    context = None
+    async for event in retrieve_context(base_url, question, max_links, crawl_engine):
+        if event["event"] == "context":
+            context = event["context"]
+
+    if context is None:
+        return NO_CONTENT_ANSWER, None
 
     # Generate an answer using the context
-    return ask_gemini(question, context)
+    return await ask_gemini_async(question, context)
+
+
+async def gemini_rag_pipeline_stream(base_url, question, max_links=10, crawl_engine=None):
+    """
+    Streaming variant of `gemini_rag_pipeline`: yields progress events per stage,
+    then the answer as `token` events, then a `usage` event and a final `done` event.
+    """
+    context = None
+    async for event in retrieve_context(base_url, question, max_links, crawl_engine):
+        if event["event"] == "context":
+            context = event["context"]
+        else:
+            yield event
+
+    if context is None:
+        yield {"event": "token", "text": NO_CONTENT_ANSWER}
+    else:
+        yield {"event": "stage", "stage": "generate", "status": "started"}
+        usage = {}
+        async for text in ask_gemini_stream(question, context, usage):
+            yield {"event": "token", "text": text}
+        yield {"event": "stage", "stage": "generate", "status": "done"}
+        yield {"event": "usage", **usage}
+
+    yield {"event": "done"}
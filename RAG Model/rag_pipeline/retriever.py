@@ -1,16 +1,25 @@
 from langchain.vectorstores import FAISS
 from langchain.schema import Document
-from langchain.embeddings import SentenceTransformerEmbeddings
 
 def build_faiss_index(texts, embedding_model):
-    # If embedding_model is not wrapped in LangChain, wrap it with SentenceTransformerEmbeddings
-    if not isinstance(embedding_model, SentenceTransformerEmbeddings):
-        embedding_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-
     # Create Document objects for each text
     docs = [Document(page_content=text) for text in texts]
 
-    # Create FAISS index from the list of documents
+    # Create FAISS index from the list of documents using the shared embedding service
     faiss_index = FAISS.from_documents(docs, embedding_model)
 
     return faiss_index
+
+def build_faiss_index_from_embeddings(texts, vectors, embedding_model, metadatas=None, ids=None):
+    # Write already computed vectors straight into a new index
+    return FAISS.from_embeddings(list(zip(texts, vectors)), embedding_model, metadatas=metadatas, ids=ids)
+
+def update_faiss_index(index, texts, vectors, metadatas, ids, delete_ids):
+    """
+    Remove the vectors in `delete_ids` and add the precomputed `vectors` for `texts` under `ids`.
+    """
+    if delete_ids:
+        index.delete(delete_ids)
+    if texts:
+        index.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+    return index
@@ -1,88 +1,40 @@
+import asyncio
 import json
-import os
 import uuid
+from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from langchain_core.messages import HumanMessage, BaseMessage, AIMessage
-from config import FAISS_INDEX_PATH, SCREENSHOT_DIR, DOCSTORE_PATH, QNA_PARSED_TEXT_PATH
-from vectorstore.loader import load_or_build_vectorstore
-from vectorstore.custom_diallab_embeddings import DialLabEmbeddings
-from vectorstore.custom_diallab_retriever import DialLabRetriever
-from langchain.schema import Document
-from graph.chat_graph import build_graph
-import global_retriever
+from runtime import ChatRuntime
 from dotenv import load_dotenv
-from chat_history import load_chat_history, save_chat_history  # Import your chat history functions
+from chat_history import session_store
+from graph.response_cache import response_cache
+from graph.summarizer import schedule_summary
 from langsmith import traceable
 
 load_dotenv()
 
-app = FastAPI()
 
-# Function to load parsed documents (screenshots)
-def load_or_parse_documents():
-    if os.path.exists(DOCSTORE_PATH):
-        with open(DOCSTORE_PATH, "r", encoding="utf-8") as f:
-            texts = [doc["page_content"] for doc in json.load(f)]
-    else:
-        texts = []
-    return texts
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the index, docstore, retriever and compiled graph once for the whole process
+    app.state.runtime = await asyncio.to_thread(ChatRuntime)
+    yield
+    await app.state.runtime.aclose()
 
-# Function to load QnA documents (directly from the pre-parsed qna_texts.json)
-def load_qna_documents():
-    if os.path.exists(QNA_PARSED_TEXT_PATH):
-        with open(QNA_PARSED_TEXT_PATH, "r", encoding="utf-8") as f:
-            qna_data = json.load(f)
 
-        qna_texts = [item["page_content"] for item in qna_data]
-        return qna_texts
-    else:
-        print("⚠️ QnA data not found!")
-        return []
+app = FastAPI(lifespan=lifespan)
 
 
 # Define an async chat function to handle the async `graph.ainvoke()`
 @traceable()
-async def chat_async(session_id: str, chat_history: List[BaseMessage]) -> str:
-    # 1. Set up vectorstore embeddings
-    embeddings = DialLabEmbeddings(
-        model=os.getenv("DIAL_LAB_MODEL"),
-        api_key=os.getenv("DIAL_LAB_KEY"),
-        base_url=os.getenv("DIAL_LAB_BASE_URL")
-    )
-
-    # 2. Load or build vectorstore from saved disk data
-    vectorstore = load_or_build_vectorstore(embeddings)
-
-    # 3. Create retriever
-    retriever = DialLabRetriever(
-        model=embeddings.model,
-        api_key=embeddings.api_key,
-        base_url=os.getenv("DIAL_LAB_BASE_URL"),
-        faiss_index=vectorstore
-    )
-
-    global_retriever.retriever = retriever
-    print("Global retriever set.")
-
-    # 4. Build and run LangGraph
-    graph = build_graph(
-        session_id=session_id,
-        faiss_index_path=FAISS_INDEX_PATH,
-        model=embeddings.model,
-        api_key=embeddings.api_key
-    )
-
-    state = {
-        "messages": chat_history,
-        "session_id": session_id,
-        "faiss_index_path": FAISS_INDEX_PATH,
-        "model": embeddings.model,
-        "api_key": embeddings.api_key
-    }
+async def chat_async(runtime: ChatRuntime, session_id: str, chat_history: List[BaseMessage],
+                     summary: str = "", summary_covers: int = 0) -> str:
+    state = runtime.initial_state(session_id, chat_history, summary=summary, summary_covers=summary_covers)
 
-    result = await graph.ainvoke(state, config={"configurable": {"thread_id": session_id}})
+    result = await runtime.graph.ainvoke(state, config={"configurable": {"thread_id": session_id}})
     reply = result["messages"][-1].content if result.get("messages") else "No response generated."
 
     return reply
@@ -95,22 +47,85 @@ async def chat(request: Request):
     user_message = data.get("message", "")
     session_id = data.get("session_id", str(uuid.uuid4()))  # Generate new if not provided
 
-    # 1. Load the chat history
-    chat_history = load_chat_history(session_id)
+    # Serialise turns of the same session so concurrent requests cannot lose messages
+    async with session_store.session_lock(session_id):
+        # 1. Load the chat history (served from memory for hot sessions)
+        chat_history = session_store.load(session_id)
+        summary, covers = session_store.load_summary(session_id)
 
-    # 2. Add the new user message
-    chat_history.append(HumanMessage(content=user_message))
+        # 2. Add the new user message
+        user_turn = HumanMessage(content=user_message)
+        chat_history.append(user_turn)
 
-    # 3. Get the AI reply using full history
-    try:
-        reply = await chat_async(session_id, chat_history)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating reply: {str(e)}")
+        # 3. Get the AI reply using full history
+        try:
+            reply = await chat_async(request.app.state.runtime, session_id, chat_history, summary, covers)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error generating reply: {str(e)}")
 
-    # 4. Append AI response
-    chat_history.append(AIMessage(content=reply))
+        # 4. Append only this turn's messages to the session log
+        session_store.append(session_id, [user_turn, AIMessage(content=reply)])
 
-    # 5. Save updated history
-    save_chat_history(session_id, chat_history)
+        # 5. Fold messages that left the history window into the rolling summary, off the request path
+        schedule_summary(session_id)
 
     return {"response": reply, "session_id": session_id}
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    data = await request.json()
+    user_message = data.get("message", "")
+    session_id = data.get("session_id", str(uuid.uuid4()))  # Generate new if not provided
+    runtime = request.app.state.runtime
+
+    async def event_stream():
+        yield f"event: session\ndata: {json.dumps({'session_id': session_id})}\n\n"
+
+        async with session_store.session_lock(session_id):
+            chat_history = session_store.load(session_id)
+            summary, covers = session_store.load_summary(session_id)
+            user_turn = HumanMessage(content=user_message)
+            chat_history.append(user_turn)
+
+            state = runtime.initial_state(
+                session_id, chat_history, stream=True, summary=summary, summary_covers=covers
+            )
+            reply = None
+            streamed = False
+            try:
+                async for event in runtime.graph.astream_events(
+                    state, config={"configurable": {"thread_id": session_id}}, version="v2"
+                ):
+                    if event["event"] == "on_custom_event" and event["name"] == "token":
+                        streamed = True
+                        yield f"event: token\ndata: {json.dumps(event['data'])}\n\n"
+                    elif event["event"] == "on_chain_end" and not event["parent_ids"]:
+                        # End of the whole graph run
+                        messages = event["data"]["output"].get("messages")
+                        reply = messages[-1].content if messages else "No response generated."
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'detail': f'Error generating reply: {str(e)}'})}\n\n"
+                return
+
+            if reply is None:
+                reply = "No response generated."
+            if not streamed:
+                # Cached answers and early errors are not streamed by the graph; send them whole
+                yield f"event: token\ndata: {json.dumps({'text': reply})}\n\n"
+
+            # Persist the turn once the full reply is known
+            session_store.append(session_id, [user_turn, AIMessage(content=reply)])
+            schedule_summary(session_id)
+
+        yield f"event: done\ndata: {json.dumps({'response': reply, 'session_id': session_id})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/metrics/cache")
+async def cache_metrics(request: Request):
+    return {
+        "responses": response_cache.stats(),
+        "query_embeddings": request.app.state.runtime.retriever.query_cache.stats(),
+    }
@@ -1,44 +1,262 @@
+import asyncio
 import json
 import os
-from typing import List
-
-from langchain_core.messages import messages_from_dict, BaseMessage
-
-# Function to load the chat history from a file
-def load_chat_history(session_id: str):
-    chat_history_path = f"./.chat_memory/{session_id}_history.json"
-
-    if os.path.exists(chat_history_path):
-        with open(chat_history_path, "r") as file:
-            data = json.load(file)
-            messages = data.get("messages", [])
-
-            # Adjusting the format to match langchain_core.messages expected format
-            for message in messages:
-                if "data" not in message:
-                    message["data"] = {
-                        "content": message.get("content", ""),
-                        "metadata": message.get("response_metadata", {})
-                    }
-
-                # Remove the additional fields that are not required by messages_from_dict
-                message.pop("response_metadata", None)
-                message.pop("additional_kwargs", None)
-                message.pop("tool_calls", None)
-                message.pop("invalid_tool_calls", None)
-                message.pop("usage_metadata", None)
-
-            return messages_from_dict(messages)
-    else:
-        return []
-
-# Function to save chat history to a file
-def save_chat_history(session_id: str, messages: List[BaseMessage]):
-    os.makedirs("./.chat_memory", exist_ok=True)
-    chat_history_path = f"./.chat_memory/{session_id}_history.json"
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from langchain_core.messages import messages_from_dict, message_to_dict, BaseMessage
+
+CHAT_MEMORY_DIR = "./.chat_memory"
+HOT_SESSION_CACHE_SIZE = 256  # sessions kept in memory
+COMPACT_AFTER_DEAD_RECORDS = 20  # superseded log records tolerated before a session log is rewritten
+
+
+# Function to load the chat history from the old pretty-printed JSON file
+def load_legacy_chat_history(chat_history_path: str) -> List[BaseMessage]:
+    with open(chat_history_path, "r") as file:
+        data = json.load(file)
+        messages = data.get("messages", [])
+
+        # Adjusting the format to match langchain_core.messages expected format
+        for message in messages:
+            if "data" not in message:
+                message["data"] = {
+                    "content": message.get("content", ""),
+                    "metadata": message.get("response_metadata", {})
+                }
+
+            # Remove the additional fields that are not required by messages_from_dict
+            message.pop("response_metadata", None)
+            message.pop("additional_kwargs", None)
+            message.pop("tool_calls", None)
+            message.pop("invalid_tool_calls", None)
+            message.pop("usage_metadata", None)
+
+        return messages_from_dict(messages)
+
+
+class SessionStore:
+    def __init__(self, directory: str = CHAT_MEMORY_DIR, cache_size: int = HOT_SESSION_CACHE_SIZE,
+                 compact_after: int = COMPACT_AFTER_DEAD_RECORDS):
+        """
+        Chat history store backed by one append-only JSONL log per session.
+
+        Each turn appends its new messages as single lines, so the cost of a turn does not
+        depend on the length of the conversation. Hot sessions are cached in memory (LRU),
+        and logs that accumulate superseded records are compacted on a background thread.
+        The log also carries the session's rolling summary of its oldest messages.
+
+        Args:
+            directory: Directory holding the `{session_id}_history.jsonl` logs.
+            cache_size: Number of sessions kept in memory.
+            compact_after: Number of superseded records that triggers compaction of a log.
+        """
+        self.directory = directory
+        self.cache_size = cache_size
+        self.compact_after = compact_after
+        self._cache = OrderedDict()  # session_id -> list of messages
+        self._summaries = {}  # session_id -> (summary, number of leading messages it covers)
+        self._dead_records = {}  # session_id -> records superseded by a later "replace"
+        self._cache_lock = threading.Lock()
+        self._file_locks = weakref.WeakValueDictionary()
+        self._session_locks = weakref.WeakValueDictionary()
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-history-compactor")
+
+    def _log_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}_history.jsonl")
+
+    def _legacy_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}_history.json")
+
+    def _file_lock(self, session_id: str) -> threading.RLock:
+        with self._cache_lock:
+            lock = self._file_locks.get(session_id)
+            if lock is None:
+                lock = threading.RLock()
+                self._file_locks[session_id] = lock
+            return lock
+
+    def session_lock(self, session_id: str) -> asyncio.Lock:
+        """
+        Lock to hold for a whole load -> generate -> save turn, so concurrent
+        requests for one session cannot interleave.
+        """
+        with self._cache_lock:
+            lock = self._session_locks.get(session_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._session_locks[session_id] = lock
+            return lock
+
+    def _remember(self, session_id: str, messages: List[BaseMessage]):
+        with self._cache_lock:
+            self._cache[session_id] = messages
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                evicted, _ = self._cache.popitem(last=False)
+                self._summaries.pop(evicted, None)
+
+    def _cached(self, session_id: str):
+        with self._cache_lock:
+            messages = self._cache.get(session_id)
+            if messages is not None:
+                self._cache.move_to_end(session_id)
+            return messages
 
-    # Convert the messages to a dictionary format that can be saved
-    messages_dict = [msg.dict() for msg in messages]  # langchain message to dict
+    def _write_records(self, session_id: str, records: List[dict]):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._log_path(session_id), "a", encoding="utf-8") as file:
+            file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
 
-    with open(chat_history_path, "w", encoding="utf-8") as file:
-        json.dump({"messages": messages_dict}, file, ensure_ascii=False, indent=4)
+    def _read_log(self, session_id: str) -> List[BaseMessage]:
+        messages = []
+        summary = ("", 0)
+        dead = 0
+        records = 0
+        with open(self._log_path(session_id), "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write; everything before it is intact
+                    continue
+                records += 1
+                if record["op"] == "append":
+                    messages.extend(messages_from_dict([record["message"]]))
+                elif record["op"] == "replace":
+                    dead = records - 1
+                    messages = messages_from_dict(record["messages"])
+                    summary = (record.get("summary", ""), record.get("summary_covers", 0))
+                elif record["op"] == "summary":
+                    dead += 1 if summary[0] else 0
+                    summary = (record["summary"], record["covers"])
+        self._dead_records[session_id] = dead
+        self._summaries[session_id] = summary
+        return messages
+
+    def load(self, session_id: str) -> List[BaseMessage]:
+        """
+        Return a copy of the session's messages (empty for a new session).
+        """
+        messages = self._cached(session_id)
+        if messages is None:
+            with self._file_lock(session_id):
+                if os.path.exists(self._log_path(session_id)):
+                    messages = self._read_log(session_id)
+                elif os.path.exists(self._legacy_path(session_id)):
+                    # Migrate the old whole-file JSON history into a log on first access
+                    messages = load_legacy_chat_history(self._legacy_path(session_id))
+                    self._write_records(session_id, [
+                        {"op": "replace", "messages": [message_to_dict(m) for m in messages]}
+                    ])
+                else:
+                    messages = []
+            self._remember(session_id, messages)
+        return list(messages)
+
+    def load_summary(self, session_id: str) -> Tuple[str, int]:
+        """
+        Return `(summary, covers)`: the rolling summary of the session's first `covers`
+        messages, or `("", 0)` when nothing has been summarised yet.
+        """
+        self.load(session_id)
+        return self._summaries.get(session_id, ("", 0))
+
+    def save_summary(self, session_id: str, summary: str, covers: int):
+        """
+        Record a new rolling summary covering the first `covers` messages of the session.
+        """
+        with self._file_lock(session_id):
+            stored = self.load(session_id)
+            if covers > len(stored):
+                # The history was replaced while the summary was being written
+                return
+            self._write_records(session_id, [{"op": "summary", "summary": summary, "covers": covers}])
+            dead = self._dead_records.get(session_id, 0)
+            if self._summaries.get(session_id, ("", 0))[0]:
+                # The previous summary record is now superseded
+                dead += 1
+                self._dead_records[session_id] = dead
+            self._summaries[session_id] = (summary, covers)
+
+        if dead >= self.compact_after:
+            self._compactor.submit(self.compact, session_id)
+
+    def append(self, session_id: str, new_messages: List[BaseMessage]):
+        """
+        Append messages to the end of the session's history.
+        """
+        if not new_messages:
+            return
+        with self._file_lock(session_id):
+            stored = self.load(session_id)
+            self._write_records(session_id, [
+                {"op": "append", "message": message_to_dict(m)} for m in new_messages
+            ])
+            self._remember(session_id, stored + list(new_messages))
+
+    def save(self, session_id: str, messages: List[BaseMessage]):
+        """
+        Persist `messages` as the full history of the session.
+
+        When they extend the stored history only the new tail is appended;
+        otherwise a single "replace" record supersedes the log.
+        """
+        with self._file_lock(session_id):
+            stored = self.load(session_id)
+            extends_stored = len(messages) >= len(stored) and (
+                not stored or (
+                    messages[len(stored) - 1].type == stored[-1].type
+                    and messages[len(stored) - 1].content == stored[-1].content
+                )
+            )
+            if extends_stored:
+                self.append(session_id, messages[len(stored):])
+                return
+
+            # A rewritten history invalidates the summary of its old messages
+            self._write_records(session_id, [
+                {"op": "replace", "messages": [message_to_dict(m) for m in messages]}
+            ])
+            dead = self._dead_records.get(session_id, 0) + len(stored) + 1
+            self._dead_records[session_id] = dead
+            self._remember(session_id, list(messages))
+            self._summaries[session_id] = ("", 0)
+
+        if dead >= self.compact_after:
+            self._compactor.submit(self.compact, session_id)
+
+    def compact(self, session_id: str):
+        """
+        Rewrite a session log as a single snapshot record.
+        """
+        path = self._log_path(session_id)
+        with self._file_lock(session_id):
+            messages = self.load(session_id)
+            summary, covers = self._summaries.get(session_id, ("", 0))
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(json.dumps(
+                    {"op": "replace", "messages": [message_to_dict(m) for m in messages],
+                     "summary": summary, "summary_covers": covers},
+                    ensure_ascii=False
+                ) + "\n")
+            os.replace(tmp_path, path)
+            self._dead_records[session_id] = 0
+        print(f"🧹 Compacted chat history for session {session_id}")
+
+
+session_store = SessionStore()
+
+
+# Function to load the chat history of a session
+def load_chat_history(session_id: str) -> List[BaseMessage]:
+    return session_store.load(session_id)
+
+
+# Function to save chat history; only messages not yet stored are written
+def save_chat_history(session_id: str, messages: List[BaseMessage]):
+    session_store.save(session_id, messages)
@@ -7,7 +7,15 @@ WEBAPP_URL = 'http://localhost:4200'  # Change this to your webapp URL
 OMNIPARSER_API = 'http://localhost:8000/process/'
 
 # Gemini API endpoint
+# Both take a POST of {"message": ..., "semantics": ...}. GEMINI_API replies with {"text": ...};
+# GEMINI_STREAM_API replies with newline-delimited JSON, one {"text": <partial answer>} object per
+# line as it is generated. /chat/stream falls back to GEMINI_API when the stream endpoint fails
+# before sending any text (e.g. a proxy without it answers 404).
 GEMINI_API = 'http://localhost:5000/api/gemini/generate'
+GEMINI_STREAM_API = 'http://localhost:5000/api/gemini/stream'
+GEMINI_TIMEOUT_SECONDS = 60
+GEMINI_POOL_SIZE = 20  # keep-alive connections shared by all calls
+GEMINI_MAX_CONCURRENCY = 8  # requests in flight at once
 
 # Directory where screenshots are saved
 SCREENSHOT_DIR = './screenshots'
@@ -24,3 +32,43 @@ DOCSTORE_PATH = "storage/documents.json"
 QNA_DOC_PATH = "storage/QnA Document for Ustora Website.txt"
 QNA_PARSED_PATH = "storage/qna_data.json"
 QNA_PARSED_TEXT_PATH = "storage/qna_texts.json"
+INDEX_MANIFEST_PATH = "storage/index_manifest.json"  # content hash -> vector id for every indexed chunk
+INDEX_DOCSTORE_PATH = "storage/index_documents.bin"  # indexed documents by vector id, memory-mapped at load
+INDEX_SOURCES_PATH = "storage/index_sources.json"  # source file fingerprints the saved index was built from
+EMBEDDING_CHECKPOINT_PATH = "storage/embedding_checkpoint.jsonl"  # batches embedded by an unfinished create_vectorstore run
+
+# DialLab embeddings client
+EMBEDDING_TIMEOUT_SECONDS = 30
+EMBEDDING_MAX_RETRIES = 4  # retries on 429/5xx and connection errors, with jittered exponential backoff
+EMBEDDING_POOL_SIZE = 20  # keep-alive connections shared by all requests
+EMBEDDING_MAX_BATCH_SIZE = 64  # texts per embeddings request
+EMBEDDING_BATCH_WINDOW_MS = 5  # how long a query waits for others to share its request
+
+# Query embedding cache (in-process LRU + optional SQLite file; set the path to None to disable disk)
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+QUERY_EMBEDDING_CACHE_PATH = "storage/query_embeddings.sqlite"
+QUERY_EMBEDDING_CACHE_DISK_SIZE = 50000
+
+# Semantic answer cache in front of Gemini
+RESPONSE_CACHE_SIZE = 1000
+RESPONSE_CACHE_TTL_SECONDS = 60 * 60
+RESPONSE_CACHE_SIMILARITY = 0.95  # cosine similarity between questions needed to reuse an answer
+
+# Chat history token budget
+HISTORY_MAX_TOKENS = 1000
+HISTORY_TOKEN_ENCODING = "cl100k_base"  # tiktoken encoding used to count history tokens
+HISTORY_TOKEN_CACHE_SIZE = 8192  # per-message token counts kept in memory
+
+# Rolling summary of messages that fall out of the history window
+SUMMARY_TRIGGER_MESSAGES = 6  # unsummarised messages outside the window before a new summary is written
+SUMMARY_MAX_TOKENS = 300
+
+# Screenshot ingestion through OmniParser
+OMNIPARSER_CONCURRENCY = 4  # screenshots parsed at once
+IMAGE_COMPRESSION_WORKERS = 2  # processes resizing and JPEG-encoding screenshots before upload
+PARSE_CACHE_PATH = "storage/screenshot_parse_cache.jsonl"  # OmniParser output keyed by SHA-256 of the file
+# Perceptual-hash bits (of 256) within which a screenshot is skipped as a near-duplicate of an
+# earlier one in the same run, or -1 to disable. Off by default: the hash does not change when
+# only a product name or price does, so any match between different files can drop real content.
+# Byte-identical screenshots are always parsed once and share the result.
+NEAR_DUPLICATE_DISTANCE = -1
@@ -1,11 +1,19 @@
+import hashlib
 import json
 import os
 import asyncio
 import re
+import time
+
+import aiohttp
 
 from screenshot_capture import capture_screenshots_for_all_pages
-from parsers.omniparser_client import parse_image_with_retries
-from config import SCREENSHOT_DIR, DOCSTORE_PATH, QNA_DOC_PATH, QNA_PARSED_TEXT_PATH
+from parsers.omniparser_client import parse_image_with_retries, compress_image, shutdown_compression_pool
+from parsers.image_hash import dhash, hamming_distance
+from config import (
+    SCREENSHOT_DIR, DOCSTORE_PATH, QNA_DOC_PATH, QNA_PARSED_TEXT_PATH,
+    OMNIPARSER_CONCURRENCY, PARSE_CACHE_PATH, NEAR_DUPLICATE_DISTANCE
+)
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -99,24 +107,174 @@ async def process_qna_document(qna_file_path):
     save_qna_texts(qna_texts)
 
 
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_parse_cache() -> dict:
+    """OmniParser output of earlier runs, keyed by the SHA-256 of the screenshot file."""
+    cache = {}
+    if os.path.exists(PARSE_CACHE_PATH):
+        with open(PARSE_CACHE_PATH, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+                cache[record["hash"]] = record["content"]
+    return cache
+
+
+def append_parse_cache(content_hash: str, filename: str, content: str):
+    os.makedirs(os.path.dirname(PARSE_CACHE_PATH), exist_ok=True)
+    with open(PARSE_CACHE_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"hash": content_hash, "file": filename, "content": content}, ensure_ascii=False) + "\n")
+
+
+def write_parse_cache(entries: dict):
+    """Rewrite the cache with only `entries`, dropping screenshots that no longer exist."""
+    os.makedirs(os.path.dirname(PARSE_CACHE_PATH), exist_ok=True)
+    tmp_path = f"{PARSE_CACHE_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for content_hash, (filename, content) in entries.items():
+            f.write(json.dumps({"hash": content_hash, "file": filename, "content": content}, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, PARSE_CACHE_PATH)
+
+
+async def parse_screenshots(filenames, concurrency=OMNIPARSER_CONCURRENCY):
+    """
+    Parse screenshots through OmniParser with `concurrency` requests in flight.
+
+    A parse is only reused for a byte-identical screenshot: one whose file matches a cached
+    parse, or an earlier screenshot of the same run, is not sent again. A different screenshot
+    whose perceptual hash is within `NEAR_DUPLICATE_DISTANCE` bits of an earlier one in the
+    run is skipped as a near-duplicate; this is off unless that setting is 0 or more. Every new parse is added to the cache as soon as it
+    completes, so an interrupted run only parses the remaining screenshots when started again.
+
+    Returns the parsed text per file, in the order given. Skipped or failed files get None.
+    """
+    cache = load_parse_cache()
+
+    def hash_files():
+        return [
+            (file_hash(path), dhash(path) if NEAR_DUPLICATE_DISTANCE >= 0 else None)
+            for path in (os.path.join(SCREENSHOT_DIR, filename) for filename in filenames)
+        ]
+
+    hashes = await asyncio.to_thread(hash_files)
+
+    results = [None] * len(filenames)
+    used_cache = {}  # content hash -> (filename, content) of every screenshot kept in this run
+    copies = {}  # content hash -> indices of every screenshot with those bytes
+    kept_images = []  # (perceptual hash, filename) of every distinct screenshot kept so far
+    kept = []
+    to_parse = []
+    for idx, (filename, (content_hash, image_hash)) in enumerate(zip(filenames, hashes)):
+        if content_hash in copies:
+            # Same bytes as an earlier screenshot: share its parse
+            copies[content_hash].append(idx)
+            kept.append(idx)
+            continue
+
+        duplicate_of = None
+        if NEAR_DUPLICATE_DISTANCE >= 0:
+            duplicate_of = next(
+                (name for kept_hash, name in kept_images
+                 if hamming_distance(image_hash, kept_hash) <= NEAR_DUPLICATE_DISTANCE),
+                None
+            )
+        if duplicate_of is not None:
+            print(f"⏭️ Skipping {filename}: near-duplicate of {duplicate_of}")
+            continue
+        kept_images.append((image_hash, filename))
+        copies[content_hash] = [idx]
+        kept.append(idx)
+
+        if content_hash in cache:
+            print(f"♻️ Reusing cached parse of {filename}")
+            results[idx] = cache[content_hash]
+            used_cache[content_hash] = (filename, cache[content_hash])
+        else:
+            to_parse.append((idx, filename, content_hash))
+
+    pending = len(to_parse)
+    start = time.perf_counter()
+
+    # Compression runs one stage ahead of the uploads: screenshots are compressed in the
+    # process pool while earlier ones are being parsed, at most `concurrency` waiting at a time
+    queue = asyncio.Queue(maxsize=concurrency)
+
+    async def compressor():
+        for idx, filename, content_hash in to_parse:
+            try:
+                compressed = (await compress_image(os.path.join(SCREENSHOT_DIR, filename))).getvalue()
+            except Exception as e:
+                print(f"❌ Error compressing {filename}: {e}")
+                continue
+            await queue.put((idx, filename, content_hash, compressed))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker(session):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            idx, filename, content_hash, compressed = item
+            try:
+                print(f"\n🟡 Processing screenshot {idx + 1}/{len(filenames)}: {filename}")
+                result = await parse_image_with_retries(
+                    os.path.join(SCREENSHOT_DIR, filename), session, compressed
+                )
+                if result:
+                    content = result if isinstance(result, str) else result.get("content", "")
+                    results[idx] = content
+                    used_cache[content_hash] = (filename, content)
+                    append_parse_cache(content_hash, filename, content)
+                else:
+                    print(f"❌ Failed to parse {filename} after retries")
+            except Exception as e:
+                print(f"❌ Error parsing {filename}: {e}")
+
+    if to_parse:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+            tasks = [asyncio.create_task(compressor())]
+            tasks += [asyncio.create_task(worker(session)) for _ in range(concurrency)]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                shutdown_compression_pool()
+
+    if pending:
+        print(f"⏱️ Parsed {pending} screenshots in {time.perf_counter() - start:.1f}s")
+    print(f"🧮 {len(kept)} of {len(filenames)} screenshots kept, {len(kept) - pending} without a new parse")
+
+    for content_hash, indices in copies.items():
+        for idx in indices[1:]:
+            results[idx] = results[indices[0]]
+
+    # Compact the cache down to the screenshots of this run once all of them were parsed
+    if all(results[idx] is not None for idx in kept):
+        write_parse_cache(used_cache)
+    return results
+
+
 async def process_screenshots_and_store_context():
     """Capture and parse screenshots, saving results."""
     print("📸 Capturing screenshots...")
     await capture_screenshots_for_all_pages()
 
-    parsed_results = []
-
-    for idx, filename in enumerate(sorted(os.listdir(SCREENSHOT_DIR))):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-            screenshot_path = os.path.join(SCREENSHOT_DIR, filename)
-            print(f"\n🟡 Processing screenshot {idx + 1}: {filename}")
-
-            result = await parse_image_with_retries(screenshot_path)
-
-            if result:
-                parsed_results.append(result if isinstance(result, str) else result.get("content", ""))
-            else:
-                print(f"❌ Failed to parse {filename} after retries")
+    filenames = [
+        filename for filename in sorted(os.listdir(SCREENSHOT_DIR))
+        if filename.lower().endswith(('.png', '.jpg', '.jpeg'))
+    ]
+    results = await parse_screenshots(filenames)
+    parsed_results = [content for content in results if content is not None]
 
     save_app_context(parsed_results)
 
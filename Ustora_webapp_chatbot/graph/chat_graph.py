@@ -2,25 +2,25 @@
 
 import faiss
 from langgraph.graph import StateGraph
-from langgraph.checkpoint.memory import MemorySaver
 from graph.graph_nodes import generate_response
 from typing import TypedDict, List
 from langchain_core.messages import BaseMessage
 from langsmith import traceable
 from vectorstore.custom_diallab_retriever import DialLabRetriever
 
-from chat_history import load_chat_history
-
 class ChatState(TypedDict):
     messages: List[BaseMessage]
     session_id: str
     faiss_index_path: str
     model: str
     api_key: str
+    stream: bool
+    summary: str
+    summary_covers: int
 
 @traceable()
-def build_graph(session_id: str, faiss_index_path: str, model: str, api_key: str):
-    initial_history = load_chat_history(session_id)
+def build_graph(session_id: str = None, faiss_index_path: str = None, model: str = None, api_key: str = None):
+    # The compiled graph holds no per-session data, so one instance can serve every session
     # index = faiss.read_index(faiss_index_path)
     #
     # initial_state: ChatState = {
@@ -34,7 +34,8 @@ def build_graph(session_id: str, faiss_index_path: str, model: str, api_key: str
     graph = StateGraph(state_schema=ChatState)
     graph.add_node("generate_response", generate_response)
     graph.set_entry_point("generate_response")
-    checkpointer = MemorySaver()
 
-    compiled_graph = graph.compile(checkpointer=checkpointer)
+    # No checkpointer: history is persisted by chat_history and passed in on every call,
+    # and a shared MemorySaver would keep every session's state in memory forever
+    compiled_graph = graph.compile()
     return compiled_graph
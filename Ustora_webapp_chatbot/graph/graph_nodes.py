@@ -1,41 +1,51 @@
 # graph_nodes.py
 
 import asyncio
-from langchain_core.messages import HumanMessage, AIMessage, trim_messages
+from langchain_core.messages import HumanMessage, AIMessage
 from langsmith import traceable
-from model.gemini_client import call_gemini_api  # Your async Gemini API call
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.runnables import RunnableConfig
+from model.gemini_client import call_gemini_api, stream_gemini_api  # Your async Gemini API call
 from langchain.schema import Document
 from langchain_core.messages.base import BaseMessage
 from typing import List, TypedDict
 import global_retriever
-from transformers import AutoTokenizer
+from graph.response_cache import response_cache, context_fingerprint
+from graph.token_budget import trim_history, history_budget
+from config import SUMMARY_TRIGGER_MESSAGES
 
 from vertexai.preview.language_models import TextGenerationModel
 
-def count_tokens(messages: List[BaseMessage]) -> int:
-    # Initialize token count
-    token_count = 0
-    for message in messages:
-        # Assuming each message has a 'content' attribute
-        token_count += len(message.content.split())  # Basic word count for tokens
-    return token_count
-
-trimmer = trim_messages(
-    max_tokens=1000,
-    strategy="last",
-    token_counter=count_tokens,
-    include_system=True,
-    allow_partial=True,
-)
-
 class ChatState(TypedDict):
     messages: List[BaseMessage]
     session_id: str
     faiss_index_path: str
     model: str
     api_key: str
+    stream: bool  # emit the answer as "token" custom events while it is generated
+    summary: str  # rolling summary of the messages older than the history window
+    summary_covers: int  # number of leading messages the summary covers
 
-async def generate_response(state: ChatState) -> ChatState:
+async def _stream_answer(user_query: str, combined_context: str, config: RunnableConfig) -> str:
+    chunks = []
+    try:
+        async for text in stream_gemini_api(user_query, combined_context):
+            chunks.append(text)
+            await adispatch_custom_event("token", {"text": text}, config=config)
+    except Exception as e:
+        if not chunks:
+            # Nothing shown yet: answer through the non-streaming endpoint in a single token
+            print(f"⚠️ Gemini stream failed ({e}); falling back to the non-streaming API")
+            response_text = await call_gemini_api(user_query, combined_context)
+            await adispatch_custom_event("token", {"text": response_text}, config=config)
+            return response_text
+        error_text = f"⚠️ Error calling Gemini: {str(e)}"
+        await adispatch_custom_event("token", {"text": error_text}, config=config)
+        # Keep whatever was already shown to the user
+        return "".join(chunks) + error_text
+    return "".join(chunks)
+
+async def generate_response(state: ChatState, config: RunnableConfig) -> ChatState:
     user_query = [msg for msg in state["messages"] if isinstance(msg, HumanMessage)][-1].content
 
     retriever = global_retriever.retriever
@@ -45,16 +55,29 @@ async def generate_response(state: ChatState) -> ChatState:
         return state
 
     try:
-        documents: List[Document] = retriever.get_relevant_documents(user_query)
+        # Embedded once: used for the search and to look up earlier answers
+        query_embedding = await retriever.aembed_query(user_query)
+        documents: List[Document] = await retriever.aget_relevant_documents(user_query, query_embedding=query_embedding)
     except Exception as e:
         response_text = f"⚠️ Error retrieving documents: {str(e)}"
         state["messages"].append(AIMessage(content=response_text))
         return state
 
     context = "\n".join([doc.page_content for doc in documents if doc.page_content.strip()])
-    trimmed_history = trimmer.invoke(state["messages"])
+    # Recent turns verbatim, older ones through the rolling summary, so the prompt size stays flat
+    summary = state.get("summary", "")
+    trimmed_history = trim_history(state["messages"], history_budget(summary))
+    covers = state.get("summary_covers")
+    if covers is not None:
+        # Messages that left the window but are not in the summary yet stay in the prompt until
+        # the next summary covers them, at most SUMMARY_TRIGGER_MESSAGES of them so a summary
+        # that keeps failing cannot grow the prompt without bound
+        window_start = len(state["messages"]) - len(trimmed_history)
+        start = max(covers, window_start - SUMMARY_TRIGGER_MESSAGES)
+        if start < window_start:
+            trimmed_history = state["messages"][start:]
 
-    history_context = ""
+    history_context = f"Summary of earlier conversation: {summary}\n" if summary else ""
     for msg in trimmed_history:
         if isinstance(msg, HumanMessage):
             history_context += f"User: {msg.content}\n"
@@ -68,10 +91,20 @@ async def generate_response(state: ChatState) -> ChatState:
     if not context.strip():
         response_text = "⚠️ I couldn't find anything relevant in the app."
     else:
-        try:
-            response_text = await call_gemini_api(user_query, combined_context)
-        except Exception as e:
-            response_text = f"⚠️ Error calling Gemini: {str(e)}"
+        # Reuse the answer to a near-identical question over the same retrieved chunks, only
+        # within the same conversation (summary and earlier turns, without the current question)
+        fingerprint = context_fingerprint(documents, summary, trimmed_history[:-1])
+        response_text = response_cache.get(query_embedding, fingerprint)
+        if response_text is None:
+            if state.get("stream"):
+                response_text = await _stream_answer(user_query, combined_context, config)
+            else:
+                try:
+                    response_text = await call_gemini_api(user_query, combined_context)
+                except Exception as e:
+                    response_text = f"⚠️ Error calling Gemini: {str(e)}"
+            if "⚠️" not in response_text:
+                response_cache.put(query_embedding, fingerprint, response_text)
 
     state["messages"].append(AIMessage(content=response_text))
     return state
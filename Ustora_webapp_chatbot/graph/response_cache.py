@@ -0,0 +1,106 @@
+# response_cache.py
+
+import hashlib
+import itertools
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.messages.base import BaseMessage
+
+from config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SIMILARITY
+
+
+def context_fingerprint(documents: List[Document], summary: str = "", history: List[BaseMessage] = ()) -> str:
+    """
+    Identify the retrieved chunks by content, so answers go stale as soon as the index changes,
+    together with the conversation the answer was generated in (the rolling summary and the
+    earlier turns in the prompt), so an answer is never served to a different conversation.
+    """
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(hashlib.sha256(doc.page_content.encode("utf-8")).digest())
+    digest.update(hashlib.sha256(summary.encode("utf-8")).digest())
+    for message in history:
+        digest.update(hashlib.sha256(f"{message.type}\n{message.content}".encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+                 similarity: float = RESPONSE_CACHE_SIMILARITY):
+        """
+        Semantic cache of Gemini answers.
+
+        An answer is reused when a new question retrieves exactly the same chunks in the same
+        conversation (see `context_fingerprint`) and its embedding is within `similarity`
+        (cosine) of a question answered before.
+
+        Args:
+            max_entries: Number of answers kept before the least recently used are evicted.
+            ttl_seconds: Age after which an answer is no longer served.
+            similarity: Minimum cosine similarity between the two questions.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._entries = OrderedDict()  # entry id -> (created_at, fingerprint, unit vector, answer)
+        self._by_fingerprint = {}  # fingerprint -> set of entry ids
+        self._ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, entry_id):
+        _, fingerprint, _, _ = self._entries.pop(entry_id)
+        ids = self._by_fingerprint[fingerprint]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_fingerprint[fingerprint]
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, query_embedding: List[float], fingerprint: str) -> Optional[str]:
+        now = time.time()
+        query = self._unit(query_embedding)
+        best_id, best_score = None, self.similarity
+        for entry_id in list(self._by_fingerprint.get(fingerprint, ())):
+            created_at, _, vector, _ = self._entries[entry_id]
+            if now - created_at > self.ttl_seconds:
+                self._drop(entry_id)
+                continue
+            score = float(np.dot(query, vector))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return self._entries[best_id][3]
+
+    def put(self, query_embedding: List[float], fingerprint: str, answer: str):
+        entry_id = next(self._ids)
+        self._entries[entry_id] = (time.time(), fingerprint, self._unit(query_embedding), answer)
+        self._by_fingerprint.setdefault(fingerprint, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,83 @@
+# summarizer.py
+
+import asyncio
+from typing import List, Optional
+
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages.base import BaseMessage
+
+from chat_history import session_store
+from config import SUMMARY_TRIGGER_MESSAGES, SUMMARY_MAX_TOKENS
+from graph.token_budget import get_encoding, history_budget, trim_history
+from model.gemini_client import call_gemini_api
+
+SUMMARY_INSTRUCTION = (
+    "Update the summary of this conversation between a user and the Ustora shop assistant. "
+    "Merge the new messages into the summary so far, keeping facts, user preferences and open "
+    f"questions. Reply with the summary only, in at most {SUMMARY_MAX_TOKENS} tokens."
+)
+
+_in_flight = set()  # session ids being summarised
+_tasks = set()  # strong references so running tasks are not garbage collected
+
+
+def format_transcript(messages: List[BaseMessage]) -> str:
+    lines = []
+    for msg in messages:
+        if isinstance(msg, HumanMessage):
+            lines.append(f"User: {msg.content}")
+        elif isinstance(msg, AIMessage):
+            lines.append(f"Assistant: {msg.content}")
+    return "\n".join(lines)
+
+
+async def summarise(previous_summary: str, messages: List[BaseMessage]) -> Optional[str]:
+    """
+    Fold `messages` into `previous_summary`, or None when Gemini could not be reached.
+    """
+    semantics = f"### Summary So Far\n{previous_summary}\n### New Messages\n{format_transcript(messages)}\n"
+    summary = await call_gemini_api(SUMMARY_INSTRUCTION, semantics)
+    if not summary.strip() or summary.startswith("⚠️"):
+        return None
+
+    # Hold the summary to its budget even if the model ignores the instruction
+    encoding = get_encoding()
+    tokens = encoding.encode(summary)
+    if len(tokens) > SUMMARY_MAX_TOKENS:
+        summary = encoding.decode(tokens[:SUMMARY_MAX_TOKENS])
+    return summary
+
+
+async def _update_summary(session_id: str, previous_summary: str, messages: List[BaseMessage], covers: int):
+    try:
+        summary = await summarise(previous_summary, messages)
+        if summary is not None:
+            session_store.save_summary(session_id, summary, covers)
+            print(f"📝 Summarised the first {covers} messages of session {session_id}")
+    except Exception as e:
+        print(f"❌ Failed to summarise session {session_id}: {e}")
+    finally:
+        _in_flight.discard(session_id)
+
+
+def schedule_summary(session_id: str):
+    """
+    Summarise, in the background, the messages that have fallen out of the history window.
+
+    Nothing is scheduled until at least `SUMMARY_TRIGGER_MESSAGES` messages are outside both
+    the window and the current summary, so Gemini is not called on every turn. Until then
+    `generate_response` keeps those messages in the prompt, so none are dropped.
+    """
+    if session_id in _in_flight:
+        return
+
+    summary, covers = session_store.load_summary(session_id)
+    messages = session_store.load(session_id)
+    window_start = len(messages) - len(trim_history(messages, history_budget(summary)))
+    if window_start - covers < SUMMARY_TRIGGER_MESSAGES:
+        return
+
+    _in_flight.add(session_id)
+    task = asyncio.create_task(_update_summary(session_id, summary, messages[covers:window_start], window_start))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
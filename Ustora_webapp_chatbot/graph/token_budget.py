@@ -0,0 +1,71 @@
+# token_budget.py
+
+from functools import lru_cache
+from typing import List
+
+import tiktoken
+from langchain_core.messages import SystemMessage
+from langchain_core.messages.base import BaseMessage
+
+from config import HISTORY_MAX_TOKENS, HISTORY_TOKEN_ENCODING, HISTORY_TOKEN_CACHE_SIZE
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role label and separators around every message in the prompt
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    return tiktoken.get_encoding(HISTORY_TOKEN_ENCODING)
+
+
+@lru_cache(maxsize=HISTORY_TOKEN_CACHE_SIZE)
+def count_text_tokens(text: str) -> int:
+    # Stored messages keep the same content string across turns, so each one is encoded once
+    return len(get_encoding().encode(text))
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    return count_text_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def count_tokens(messages: List[BaseMessage]) -> int:
+    return sum(count_message_tokens(message) for message in messages)
+
+
+def _keep_tail(message: BaseMessage, max_tokens: int) -> BaseMessage:
+    encoding = get_encoding()
+    tokens = encoding.encode(message.content)
+    return message.model_copy(update={"content": encoding.decode(tokens[-max_tokens:])})
+
+
+def trim_history(messages: List[BaseMessage], max_tokens: int = HISTORY_MAX_TOKENS) -> List[BaseMessage]:
+    """
+    Keep the most recent messages that fit in `max_tokens`, plus a leading system message.
+
+    Walks back from the newest message and stops as soon as the budget is spent, so the cost
+    depends on the size of the budget rather than on the length of the conversation. The
+    oldest message that only partly fits is cut down to its last tokens.
+    """
+    system = messages[:1] if messages and isinstance(messages[0], SystemMessage) else []
+    budget = max_tokens - count_tokens(system)
+
+    kept = []
+    for message in reversed(messages[len(system):]):
+        if budget <= 0:
+            break
+        tokens = count_message_tokens(message)
+        if tokens > budget:
+            if budget > MESSAGE_OVERHEAD_TOKENS:
+                kept.append(_keep_tail(message, budget - MESSAGE_OVERHEAD_TOKENS))
+            break
+        kept.append(message)
+        budget -= tokens
+
+    kept.reverse()
+    return system + kept
+
+
+def history_budget(summary: str, max_tokens: int = HISTORY_MAX_TOKENS) -> int:
+    """
+    Tokens left for recent messages once the rolling summary is in the prompt.
+    """
+    return max_tokens - (count_text_tokens(summary) if summary else 0)
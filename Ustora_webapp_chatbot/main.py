@@ -15,6 +15,7 @@ from vectorstore.loader import load_or_build_vectorstore
 from langchain.schema import Document
 from langchain_core.messages import HumanMessage, AIMessage
 from graph.chat_graph import build_graph  # Your build_graph implementation
+from model.gemini_client import gemini_client
 import global_retriever
 
 # Load environment variables
@@ -92,7 +93,12 @@ async def get_response_from_graph(user_input: str):
     print("State being passed into graph.ainvoke():", state)
 
     # Using `ainvoke` for asynchronous invocation
-    result = await graph.ainvoke(state, config={"configurable": {"thread_id": st.session_state.session_id}})
+    try:
+        result = await graph.ainvoke(state, config={"configurable": {"thread_id": st.session_state.session_id}})
+    finally:
+        # Each question runs in its own asyncio.run loop; close the HTTP sessions bound to it
+        await gemini_client.aclose()
+        await retriever.embeddings.aclose()
 
     # Assuming the response is in result["messages"]
     return result["messages"]
@@ -1,33 +1,166 @@
 # gemini_client.py
 
+import asyncio
 import json
+from typing import AsyncIterator
+
 import aiohttp
-from config import GEMINI_API
+from config import GEMINI_API, GEMINI_STREAM_API, GEMINI_TIMEOUT_SECONDS, GEMINI_POOL_SIZE, GEMINI_MAX_CONCURRENCY
 from langsmith import traceable
 
-@traceable
-async def call_gemini_api(message: str, semantics: str) -> str:
-    payload = {
-        "message": message,
-        "semantics": semantics
-    }
-    headers = {"Content-Type": "application/json"}
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(GEMINI_API, json=payload, headers=headers) as response:
+JSON_FENCE = "```json"
+
+
+def clean_response(response_text: str) -> str:
+    # Strip the ```json fence Gemini sometimes wraps answers in
+    if response_text.startswith(JSON_FENCE) and response_text.endswith('```'):
+        response_text = response_text[len(JSON_FENCE):-3].strip()
+    return response_text
+
+
+class GeminiAPIError(Exception):
+    def __init__(self, status: int, text: str):
+        super().__init__(f"Gemini API Error: {status} - {text}")
+        self.status = status
+
+
+class GeminiClient:
+    def __init__(self, endpoint: str = GEMINI_API, stream_endpoint: str = GEMINI_STREAM_API,
+                 timeout: float = GEMINI_TIMEOUT_SECONDS, pool_size: int = GEMINI_POOL_SIZE,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY):
+        """
+        Long-lived client for the Gemini proxy.
+
+        Connections are kept alive in a pool shared by all calls, each request has a timeout,
+        and at most `max_concurrency` requests are in flight at once.
+
+        Args:
+            endpoint: URL returning the whole answer as `{"text": ...}`.
+            stream_endpoint: URL streaming the answer as newline-delimited `{"text": ...}` chunks.
+            timeout: Seconds allowed for a whole request, or between two streamed chunks.
+            pool_size: Number of keep-alive connections.
+            max_concurrency: Maximum number of requests in flight.
+        """
+        self.endpoint = endpoint
+        self.stream_endpoint = stream_endpoint
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # aiohttp sessions are bound to the loop that created them (Streamlit runs a new loop per call)
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._loop is not loop:
+            self._discard_session()
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers={"Content-Type": "application/json"}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._session
+
+    def _discard_session(self):
+        """
+        Close a session created on another event loop, which can only be closed on that loop.
+
+        Callers that run a new loop per call (`asyncio.run` per question) should `aclose()`
+        the client before their loop ends; this only catches sessions left open on a loop
+        that is still alive.
+        """
+        session, loop = self._session, self._loop
+        self._session = None
+        if session.closed:
+            return
+        if loop.is_closed():
+            print("⚠️ Gemini client session was left open by a finished event loop; call aclose() before it ends")
+        else:
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+    async def generate(self, message: str, semantics: str) -> dict:
+        """
+        Return the decoded JSON answer for `message` given the `semantics` context.
+        """
+        session = self._get_session()
+        payload = {
+            "message": message,
+            "semantics": semantics
+        }
+        async with self._semaphore:
+            async with session.post(self.endpoint, json=payload,
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                if response.status != 200:
+                    raise GeminiAPIError(response.status, await response.text())
+                return await response.json(content_type=None)
+
+    async def stream(self, message: str, semantics: str) -> AsyncIterator[str]:
+        """
+        Yield the answer as partial text while the proxy generates it.
+        """
+        session = self._get_session()
+        payload = {
+            "message": message,
+            "semantics": semantics
+        }
+        async with self._semaphore:
+            # No total timeout: long answers are fine as long as chunks keep arriving
+            async with session.post(self.stream_endpoint, json=payload,
+                                    timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout)) as response:
                 if response.status != 200:
-                    print(f"❌ Gemini API returned HTTP {response.status}")
-                    return "⚠️ Error calling Gemini API"
-                text = await response.text()
-                data = json.loads(text)
-                response_text = data.get('text', '')
+                    raise GeminiAPIError(response.status, await response.text())
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    text = json.loads(line).get("text", "")
+                    if text:
+                        yield text
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+gemini_client = GeminiClient()
 
-                # Clean up response
-                if response_text.startswith('```json') and response_text.endswith('```'):
-                    response_text = response_text[7:-3].strip()
 
-                return response_text
+@traceable
+async def call_gemini_api(message: str, semantics: str) -> str:
+    try:
+        data = await gemini_client.generate(message, semantics)
+    except GeminiAPIError as e:
+        print(f"❌ Gemini API returned HTTP {e.status}")
+        return "⚠️ Error calling Gemini API"
     except Exception as e:
         print(f"❌ Exception while calling Gemini API: {e}")
         return "⚠️ Error calling Gemini"
+
+    return clean_response(data.get('text', ''))
+
+
+async def stream_gemini_api(message: str, semantics: str) -> AsyncIterator[str]:
+    """
+    Streaming variant of `call_gemini_api`; errors propagate to the caller.
+
+    Answers that open with a ```json fence are held back and yielded once complete, cleaned
+    the same way as by `call_gemini_api`, so both return the same text.
+    """
+    buffer, fenced = "", None
+    async for text in gemini_client.stream(message, semantics):
+        if fenced is False:
+            yield text
+            continue
+        buffer += text
+        if fenced is None and (len(buffer) >= len(JSON_FENCE) or not JSON_FENCE.startswith(buffer)):
+            fenced = buffer.startswith(JSON_FENCE)
+            if not fenced:
+                yield buffer
+                buffer = ""
+    if buffer:
+        yield clean_response(buffer)
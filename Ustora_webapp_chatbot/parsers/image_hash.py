@@ -0,0 +1,28 @@
+# image_hash.py
+
+from PIL import Image
+
+HASH_SIZE = 16  # 16x16 comparisons -> 256-bit hash
+
+
+def dhash(image_path: str, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash of an image: a 256-bit fingerprint of its layout that survives
+    re-encoding, scaling and small content changes.
+    """
+    with Image.open(image_path) as img:
+        # JPEGs can be decoded straight to a small greyscale image
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        pixels = list(img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
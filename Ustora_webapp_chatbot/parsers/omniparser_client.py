@@ -2,38 +2,89 @@
 
 import aiohttp
 import asyncio
+import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from aiohttp import FormData, ClientTimeout
 from PIL import Image
 from io import BytesIO
-from config import OMNIPARSER_API
+from config import OMNIPARSER_API, IMAGE_COMPRESSION_WORKERS
 
 
 MAX_RETRIES = 5  # Max retries for failed requests
-RETRY_DELAY = 10  # Delay in seconds between retries
+RETRY_BASE_DELAY = 2  # First retry waits up to this many seconds, doubling on every attempt
+RETRY_MAX_DELAY = 60  # Upper bound for a single wait between retries
 
 
-async def compress_image(image_path: str, max_size=(800, 800), quality=80) -> BytesIO:
+def backoff_delay(attempt: int) -> float:
+    # Exponential backoff with full jitter so parallel workers do not retry in lockstep
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+_compression_pool = None
+_output_buffer = None  # reused by every compression in a worker process
+
+
+def get_compression_pool() -> ProcessPoolExecutor:
+    global _compression_pool
+    if _compression_pool is None:
+        _compression_pool = ProcessPoolExecutor(max_workers=IMAGE_COMPRESSION_WORKERS)
+    return _compression_pool
+
+
+def shutdown_compression_pool():
+    global _compression_pool
+    if _compression_pool is not None:
+        _compression_pool.shutdown()
+        _compression_pool = None
+
+
+def _compress_image_sync(image_path: str, max_size=(800, 800), quality=80) -> bytes:
     """
-    Resizes and compresses the image to reduce file size.
+    Resizes and compresses the image to reduce file size. Runs in a worker process.
     """
+    global _output_buffer
+    if _output_buffer is None:
+        _output_buffer = BytesIO()
+    _output_buffer.seek(0)
+    _output_buffer.truncate()
+
     with Image.open(image_path) as img:
+        # JPEGs are decoded at the smallest scale that still covers max_size (no-op for PNG)
+        img.draft("RGB", max_size)
         img.thumbnail(max_size)
-
-        # Create an in-memory byte stream
-        img_bytes = BytesIO()
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
 
         # Save the image as JPEG to compress it further (quality=80 for good balance)
-        img.save(img_bytes, format="JPEG", quality=quality)
-        img_bytes.seek(0)  # Go to the beginning of the BytesIO stream
-        return img_bytes
+        img.save(_output_buffer, format="JPEG", quality=quality)
+    return _output_buffer.getvalue()
 
 
-async def parse_image_with_omnparser(image_path: str) -> dict:
+async def compress_image(image_path: str, max_size=(800, 800), quality=80) -> BytesIO:
+    """
+    Resizes and compresses the image in the compression process pool, off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(
+        get_compression_pool(), partial(_compress_image_sync, image_path, max_size, quality)
+    )
+    return BytesIO(data)
+
+
+async def parse_image_with_omnparser(image_path: str, session: aiohttp.ClientSession = None,
+                                     compressed_image: bytes = None) -> dict:
     """
     Parse the image using OmniParser API.
+
+    Pass a `session` to share its connections between calls; otherwise one is opened for this call.
+    Pass `compressed_image` (JPEG bytes) when the image was already compressed ahead of the upload.
     """
-    compressed_image = await compress_image(image_path)
+    if compressed_image is None:
+        compressed_image = await compress_image(image_path)
+    else:
+        compressed_image = BytesIO(compressed_image)
 
     form = FormData()
     form.add_field("prompt", "")
@@ -53,31 +104,46 @@ async def parse_image_with_omnparser(image_path: str) -> dict:
     # Increase timeout to 60 seconds
     timeout = ClientTimeout(total=600)
 
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        try:
-            async with session.post(OMNIPARSER_API, data=form) as response:
-                if response.status != 200:
-                    print(f"❌ HTTP {response.status} for {image_path}")
-                    return None
-                print(f"✅ Parsed output received from OmniParser for {image_path}")
-                return await response.json()
-        except asyncio.TimeoutError:
-            print(f"⏰ Timeout while processing {image_path}")
-            return None
-
-
-async def parse_image_with_retries(image_path: str) -> dict:
+    if session is None:
+        async with aiohttp.ClientSession() as own_session:
+            return await _post_image(own_session, form, timeout, image_path)
+    return await _post_image(session, form, timeout, image_path)
+
+
+async def _post_image(session: aiohttp.ClientSession, form: FormData, timeout: ClientTimeout, image_path: str) -> dict:
+    try:
+        async with session.post(OMNIPARSER_API, data=form, timeout=timeout) as response:
+            if response.status != 200:
+                print(f"❌ HTTP {response.status} for {image_path}")
+                return None
+            print(f"✅ Parsed output received from OmniParser for {image_path}")
+            return await response.json()
+    except asyncio.TimeoutError:
+        print(f"⏰ Timeout while processing {image_path}")
+        return None
+    except aiohttp.ClientError as e:
+        print(f"❌ Request failed for {image_path}: {e}")
+        return None
+
+
+async def parse_image_with_retries(image_path: str, session: aiohttp.ClientSession = None,
+                                   compressed_image: bytes = None) -> dict:
     """
-    Retry failed requests up to `MAX_RETRIES` times with `RETRY_DELAY` delay between each.
+    Retry failed requests up to `MAX_RETRIES` times with jittered exponential backoff between them.
     """
+    if compressed_image is None:
+        # Compress once; every attempt uploads the same bytes
+        compressed_image = (await compress_image(image_path)).getvalue()
+
     for attempt in range(MAX_RETRIES):
-        result = await parse_image_with_omnparser(image_path)
+        result = await parse_image_with_omnparser(image_path, session, compressed_image)
         if result:
             return result
 
-        # Log retry information
-        print(f"❌ Retrying {image_path}... (Attempt {attempt + 1}/{MAX_RETRIES})")
-        await asyncio.sleep(RETRY_DELAY)
+        if attempt + 1 < MAX_RETRIES:
+            delay = backoff_delay(attempt)
+            print(f"❌ Retrying {image_path} in {delay:.1f}s... (Attempt {attempt + 1}/{MAX_RETRIES})")
+            await asyncio.sleep(delay)
 
     print(f"⚠️ Failed to process {image_path} after {MAX_RETRIES} attempts")
     return None
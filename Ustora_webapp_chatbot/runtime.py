@@ -0,0 +1,64 @@
+# runtime.py
+
+import os
+
+from config import FAISS_INDEX_PATH
+from vectorstore.loader import load_or_build_vectorstore
+from vectorstore.custom_diallab_embeddings import DialLabEmbeddings
+from vectorstore.custom_diallab_retriever import DialLabRetriever
+from graph.chat_graph import build_graph
+from model.gemini_client import gemini_client
+import global_retriever
+
+
+class ChatRuntime:
+    def __init__(self):
+        """
+        Application-scoped state shared by every chat request.
+
+        Loads the FAISS index and docstore, creates the retriever and compiles the
+        LangGraph once, so requests only do per-session work.
+        """
+        # 1. Set up vectorstore embeddings
+        self.embeddings = DialLabEmbeddings(
+            model=os.getenv("DIAL_LAB_MODEL"),
+            api_key=os.getenv("DIAL_LAB_KEY"),
+            base_url=os.getenv("DIAL_LAB_BASE_URL")
+        )
+
+        # 2. Load or build vectorstore from saved disk data
+        self.vectorstore = load_or_build_vectorstore(self.embeddings)
+
+        # 3. Create retriever
+        self.retriever = DialLabRetriever(
+            model=self.embeddings.model,
+            api_key=self.embeddings.api_key,
+            base_url=os.getenv("DIAL_LAB_BASE_URL"),
+            faiss_index=self.vectorstore,
+            embeddings=self.embeddings
+        )
+        global_retriever.retriever = self.retriever
+        print("Global retriever set.")
+
+        # 4. Compile the LangGraph; sessions are kept apart by thread_id at invoke time
+        self.graph = build_graph(
+            faiss_index_path=FAISS_INDEX_PATH,
+            model=self.embeddings.model,
+            api_key=self.embeddings.api_key
+        )
+
+    async def aclose(self):
+        await self.embeddings.aclose()
+        await gemini_client.aclose()
+
+    def initial_state(self, session_id, chat_history, stream=False, summary="", summary_covers=0):
+        return {
+            "messages": chat_history,
+            "session_id": session_id,
+            "faiss_index_path": FAISS_INDEX_PATH,
+            "model": self.embeddings.model,
+            "api_key": self.embeddings.api_key,
+            "stream": stream,
+            "summary": summary,
+            "summary_covers": summary_covers
+        }
@@ -0,0 +1,113 @@
+# binary_docstore.py
+
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+from langchain.docstore.base import Docstore
+from langchain.schema import Document
+
+# File layout:
+#   header  magic, record count, offset of the table
+#   records uint32 length + utf-8 text, one per document
+#   table   (int64 key, uint64 record offset) per document, sorted by key
+MAGIC = b"UDOCS001"
+HEADER = struct.Struct("<8sQQ")
+LENGTH = struct.Struct("<I")
+ENTRY = struct.Struct("<qQ")
+
+
+def write_docstore(path: str, items: Iterable[Tuple[int, str]]):
+    """
+    Write `(key, text)` pairs to `path`, replacing it atomically.
+    """
+    tmp_path = f"{path}.tmp"
+    entries = []
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        for key, text in items:
+            data = text.encode("utf-8")
+            entries.append((key, f.tell()))
+            f.write(LENGTH.pack(len(data)))
+            f.write(data)
+
+        table_offset = f.tell()
+        entries.sort()
+        for entry in entries:
+            f.write(ENTRY.pack(*entry))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(entries), table_offset))
+    os.replace(tmp_path, path)
+
+
+class BinaryDocstore(Docstore):
+    def __init__(self, path: str):
+        """
+        Read-only docstore over a file written by `write_docstore`.
+
+        The file is memory-mapped and looked up by binary search in its offset table, so
+        opening it costs the same for any corpus size and a document is only decoded
+        when a search returns it.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._table_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a binary docstore")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, position: int) -> Tuple[int, int]:
+        return ENTRY.unpack_from(self._mmap, self._table_offset + position * ENTRY.size)
+
+    def keys(self) -> Iterator[int]:
+        for position in range(self._count):
+            yield self._entry(position)[0]
+
+    def get(self, key: int) -> Optional[str]:
+        low, high = 0, self._count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            entry_key, offset = self._entry(middle)
+            if entry_key == key:
+                (length,) = LENGTH.unpack_from(self._mmap, offset)
+                start = offset + LENGTH.size
+                return self._mmap[start:start + length].decode("utf-8")
+            if entry_key < key:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return None
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        text = self.get(int(search))
+        if text is None:
+            return f"ID {search} not found."
+        return Document(page_content=text)
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class VectorIdMapping(Mapping):
+    def __init__(self, docstore: BinaryDocstore):
+        """
+        `index_to_docstore_id` for a FAISS index whose ids are the docstore keys,
+        so no per-document mapping has to be built at load time.
+        """
+        self.docstore = docstore
+
+    def __getitem__(self, vector_id: int) -> int:
+        return int(vector_id)
+
+    def __iter__(self) -> Iterator[int]:
+        return self.docstore.keys()
+
+    def __len__(self) -> int:
+        return len(self.docstore)
@@ -1,36 +1,191 @@
 # custom_diallab_embeddings.py
 
+import asyncio
 import os
+import random
+import time
+import aiohttp
 import requests
 from typing import List
 
 from dotenv import load_dotenv
 from langchain.embeddings.base import Embeddings
 from langsmith import traceable
+from config import (
+    EMBEDDING_TIMEOUT_SECONDS, EMBEDDING_MAX_RETRIES, EMBEDDING_POOL_SIZE,
+    EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_BATCH_WINDOW_MS
+)
+
+RETRY_BASE_DELAY = 0.5  # seconds
+RETRY_MAX_DELAY = 8  # seconds
+
+
+class EmbeddingAPIError(Exception):
+    def __init__(self, status: int, text: str):
+        super().__init__(f"Embedding API Error: {status} - {text}")
+        self.status = status
+
+
+def _is_retryable(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Exponential backoff with full jitter so retrying clients do not stampede together
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
 
 @traceable
 class DialLabEmbeddings(Embeddings):
     def __init__(self, model: str, api_key: str, base_url: str):
         self.model = model
         self.api_key = api_key
+        self.base_url = base_url
         self.endpoint = f"{base_url}/openai/deployments/{self.model}/embeddings"
         self.headers = {
             "Api-Key": api_key,
             "Content-Type": "application/json"
         }
 
+        # Keep-alive connection pools: one for sync callers, one per event loop for async callers
+        self._session = requests.Session()
+        self._session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=EMBEDDING_POOL_SIZE))
+        self._async_session = None
+        self._async_session_loop = None
+
+        # Queries waiting to be sent together in the next micro-batch
+        self._pending = []
+        self._flush_scheduled = False
+        # Running flushes, referenced so they are not garbage-collected mid-request
+        self._flush_tasks = set()
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), EMBEDDING_MAX_BATCH_SIZE):
+            vectors.extend(self._post(texts[start:start + EMBEDDING_MAX_BATCH_SIZE]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def _post(self, texts: List[str]) -> List[List[float]]:
         payload = {
             "input": texts
         }
-        response = requests.post(self.endpoint, headers=self.headers, json=payload)
-        if response.status_code == 200:
-            return [item["embedding"] for item in response.json()["data"]]
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                response = self._session.post(
+                    self.endpoint, headers=self.headers, json=payload, timeout=EMBEDDING_TIMEOUT_SECONDS
+                )
+            except requests.RequestException:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+            else:
+                if response.status_code == 200:
+                    return [item["embedding"] for item in response.json()["data"]]
+                if not _is_retryable(response.status_code) or attempt == EMBEDDING_MAX_RETRIES:
+                    raise EmbeddingAPIError(response.status_code, response.text)
+            time.sleep(_backoff_delay(attempt))
+
+    async def _get_async_session(self) -> aiohttp.ClientSession:
+        # aiohttp sessions are bound to the loop that created them (Streamlit runs a new loop per call)
+        loop = asyncio.get_running_loop()
+        if self._async_session is not None and self._async_session_loop is not loop:
+            self._discard_async_session()
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=EMBEDDING_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=EMBEDDING_TIMEOUT_SECONDS),
+                headers=self.headers
+            )
+            self._async_session_loop = loop
+        return self._async_session
+
+    def _discard_async_session(self):
+        # A session can only be closed on the loop that created it; callers running a loop
+        # per call should aclose() before it ends
+        session, loop = self._async_session, self._async_session_loop
+        self._async_session = None
+        if session.closed:
+            return
+        if loop.is_closed():
+            print("⚠️ Embeddings session was left open by a finished event loop; call aclose() before it ends")
         else:
-            raise Exception(f"Embedding API Error: {response.status_code} - {response.text}")
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+    async def _apost(self, texts: List[str]) -> List[List[float]]:
+        session = await self._get_async_session()
+        payload = {
+            "input": texts
+        }
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                async with session.post(self.endpoint, json=payload) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        return [item["embedding"] for item in data["data"]]
+                    text = await response.text()
+                    if not _is_retryable(response.status) or attempt == EMBEDDING_MAX_RETRIES:
+                        raise EmbeddingAPIError(response.status, text)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+            await asyncio.sleep(_backoff_delay(attempt))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[start:start + EMBEDDING_MAX_BATCH_SIZE]
+                   for start in range(0, len(texts), EMBEDDING_MAX_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._apost(batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, sharing one request with other queries issued within the batch window.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= EMBEDDING_MAX_BATCH_SIZE:
+            self._start_flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_later(EMBEDDING_BATCH_WINDOW_MS / 1000, self._start_flush)
+
+        return await future
+
+    def _start_flush(self):
+        # Flush in a task of its own: cancelling one waiting caller must not abandon the rest of the batch
+        task = asyncio.ensure_future(self._flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self):
+        self._flush_scheduled = False
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            vectors = await self._apost([text for text, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    async def aclose(self):
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+        self._session.close()
 
-    def embed_query(self, text: str) -> List[float]:
-        return self.embed_documents([text])[0]
 
 if __name__ == '__main__':
     load_dotenv()
@@ -7,10 +7,12 @@ from langchain.vectorstores import FAISS
 from langchain.schema import Document
 from langsmith import traceable
 from vectorstore.custom_diallab_embeddings import DialLabEmbeddings  # Your custom embeddings class
+from vectorstore.query_embedding_cache import QueryEmbeddingCache
 
 @traceable()
 class DialLabRetriever:
-    def __init__(self, model: str, api_key: str, base_url: str, faiss_index: FAISS):
+    def __init__(self, model: str, api_key: str, base_url: str, faiss_index: FAISS,
+                 embeddings: DialLabEmbeddings = None, query_cache: QueryEmbeddingCache = None):
         """
         Custom Retriever that uses DialLabEmbeddings for retrieving relevant documents.
 
@@ -19,15 +21,23 @@ class DialLabRetriever:
             api_key: Your API key for authenticating the request.
             base_url: The base URL for your embedding service.
             faiss_index: FAISS index where the documents are stored.
+            embeddings: Existing client to share (and its connection pool); created when omitted.
+            query_cache: Cache of query embeddings; a default memory + disk cache when omitted.
         """
-        self.embeddings = DialLabEmbeddings(model=model, api_key=api_key, base_url=base_url)
+        self.embeddings = embeddings or DialLabEmbeddings(model=model, api_key=api_key, base_url=base_url)
         self.faiss_index = faiss_index
+        self.query_cache = query_cache or QueryEmbeddingCache(model)
 
     def _embed_query(self, query: str) -> List[float]:
         """
         Embed the query text into the same vector space as the document embeddings.
+        Repeat queries are served from the cache without a network call.
         """
-        return self.embeddings.embed_query(query)
+        query_embedding = self.query_cache.get(query)
+        if query_embedding is None:
+            query_embedding = self.embeddings.embed_query(query)
+            self.query_cache.put(query, query_embedding)
+        return query_embedding
 
     def get_relevant_documents(self, query: str, k: int = 5) -> List[Document]:
         """
@@ -43,6 +53,23 @@ class DialLabRetriever:
         query_embedding = self._embed_query(query)
         return self.faiss_index.similarity_search_by_vector(query_embedding, k=k)
 
+    async def aembed_query(self, query: str) -> List[float]:
+        query_embedding = await self.query_cache.aget(query)
+        if query_embedding is None:
+            query_embedding = await self.embeddings.aembed_query(query)
+            await self.query_cache.aput(query, query_embedding)
+        return query_embedding
+
+    async def aget_relevant_documents(self, query: str, k: int = 5,
+                                      query_embedding: List[float] = None) -> List[Document]:
+        """
+        Async version of `get_relevant_documents`; the embedding call does not block the event loop.
+        Pass `query_embedding` when the caller already embedded the query.
+        """
+        if query_embedding is None:
+            query_embedding = await self.aembed_query(query)
+        return self.faiss_index.similarity_search_by_vector(query_embedding, k=k)
+
 
 # Optional test block for standalone testing
 if __name__ == "__main__":
@@ -1,10 +1,15 @@
+import hashlib
 import json
 import os
 import faiss
+import numpy as np
 from langchain.vectorstores import FAISS
 from langchain.schema import Document
-from langchain.docstore.in_memory import InMemoryDocstore
-from config import FAISS_INDEX_PATH, DOCSTORE_PATH, QNA_PARSED_TEXT_PATH, QNA_PARSED_PATH
+from config import (
+    FAISS_INDEX_PATH, DOCSTORE_PATH, QNA_PARSED_TEXT_PATH, QNA_PARSED_PATH, INDEX_MANIFEST_PATH,
+    INDEX_DOCSTORE_PATH, INDEX_SOURCES_PATH
+)
+from vectorstore.binary_docstore import BinaryDocstore, VectorIdMapping, write_docstore
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,42 +33,176 @@ def load_screenshot_data():
     return []
 
 
-def load_or_build_vectorstore(embeddings):
-    """Load or build a combined FAISS vectorstore for screenshots + QnA."""
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(model):
+    """
+    Return the manifest of the saved index, or None when it is missing or was built with another model.
+    """
+    if not os.path.exists(INDEX_MANIFEST_PATH):
+        return None
+    try:
+        with open(INDEX_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("model") != model:
+        print("⚠️ Index manifest was built with a different embedding model; rebuilding.")
+        return None
+    return manifest
+
+
+def save_index(index, manifest):
+    # Write both files next to their final paths first so a crash never leaves them out of step
+    os.makedirs(os.path.dirname(FAISS_INDEX_PATH), exist_ok=True)
+    faiss.write_index(index, f"{FAISS_INDEX_PATH}.tmp")
+    with open(f"{INDEX_MANIFEST_PATH}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(f"{FAISS_INDEX_PATH}.tmp", FAISS_INDEX_PATH)
+    os.replace(f"{INDEX_MANIFEST_PATH}.tmp", INDEX_MANIFEST_PATH)
+
+
+def migrate_legacy_index(index, documents, model):
+    """
+    Wrap an index saved before manifests existed, whose vectors line up positionally with
+    `documents`, so its vectors are kept instead of re-embedded.
+    """
+    vectors = index.reconstruct_n(0, index.ntotal)
+    id_index = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    manifest = {"model": model, "next_id": 0, "vectors": {}}
+    for doc, vector in zip(documents, vectors):
+        doc_hash = content_hash(doc.page_content)
+        if doc_hash in manifest["vectors"]:
+            continue
+        vector_id = manifest["next_id"]
+        id_index.add_with_ids(vector.reshape(1, -1), np.array([vector_id], dtype=np.int64))
+        manifest["vectors"][doc_hash] = vector_id
+        manifest["next_id"] += 1
+    print(f"🔁 Migrated legacy FAISS index ({index.ntotal} vectors) to an id-mapped index.")
+    return id_index, manifest
+
+
+def source_fingerprint():
+    """
+    Size and modification time of every source file, to tell without reading them whether they changed.
+    """
+    fingerprint = {}
+    for path in (DOCSTORE_PATH, QNA_PARSED_TEXT_PATH):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint[path] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def read_index(path):
+    # Memory-map the vectors where this faiss build supports it, so they are paged in on demand
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def open_vectorstore(embeddings):
+    docstore = BinaryDocstore(INDEX_DOCSTORE_PATH)
+    return FAISS(
+        embedding_function=embeddings,
+        index=read_index(FAISS_INDEX_PATH),
+        docstore=docstore,
+        # Vector ids double as docstore keys
+        index_to_docstore_id=VectorIdMapping(docstore)
+    )
+
+
+def update_index(embeddings):
+    """
+    Bring the saved index, manifest and docstore in line with the source files.
+
+    The manifest maps the content hash of every indexed document to its vector id, so edits
+    to the source files only embed new or changed documents and drop deleted ones.
+    """
     # Load both sets of documents
     screenshot_documents = load_screenshot_data()
     qna_texts = load_qna_texts()
     qna_documents = [Document(page_content=text) for text in qna_texts]
     all_documents = screenshot_documents + qna_documents
 
-    if os.path.exists(FAISS_INDEX_PATH) and os.path.exists(DOCSTORE_PATH) and os.path.exists(QNA_PARSED_TEXT_PATH):
+    # Identical documents share one vector
+    documents_by_hash = {}
+    for doc in all_documents:
+        documents_by_hash.setdefault(content_hash(doc.page_content), doc)
+
+    model = getattr(embeddings, "model", None)
+    index, manifest, migrated = None, None, False
+    if os.path.exists(FAISS_INDEX_PATH):
         print("🔄 Loading FAISS index from disk...")
         index = faiss.read_index(FAISS_INDEX_PATH)
+        manifest = load_manifest(model)
+        if manifest is None and not isinstance(index, faiss.IndexIDMap2) and index.ntotal == len(all_documents):
+            index, manifest = migrate_legacy_index(index, all_documents, model)
+            migrated = True
+        elif manifest is None or index.ntotal != len(manifest["vectors"]):
+            print("⚠️ FAISS index does not match its manifest; rebuilding.")
+            index = None
+    if index is None:
+        manifest = {"model": model, "next_id": 0, "vectors": {}}
 
-        # Create a new docstore from combined documents
-        docstore_dict = {str(i): doc for i, doc in enumerate(all_documents)}
-        docstore = InMemoryDocstore(docstore_dict)
+    added = [doc_hash for doc_hash in documents_by_hash if doc_hash not in manifest["vectors"]]
+    removed = [doc_hash for doc_hash in manifest["vectors"] if doc_hash not in documents_by_hash]
 
-        index_to_docstore_id = {i: str(i) for i in range(len(all_documents))}
+    if added or removed or migrated or index is None:
+        print(f"⚙️ Updating FAISS index: {len(added)} new, {len(removed)} removed documents...")
+        if removed:
+            index.remove_ids(np.array([manifest["vectors"].pop(h) for h in removed], dtype=np.int64))
 
-        vectorstore = FAISS(
-            embedding_function=embeddings,
-            index=index,
-            docstore=docstore,
-            index_to_docstore_id=index_to_docstore_id
-        )
-        print("✅ Vector store loaded successfully.")
-        return vectorstore
+        if added:
+            vectors = np.array(
+                embeddings.embed_documents([documents_by_hash[h].page_content for h in added]), dtype=np.float32
+            )
+            if index is None:
+                index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+            ids = np.arange(manifest["next_id"], manifest["next_id"] + len(added), dtype=np.int64)
+            index.add_with_ids(vectors, ids)
+            manifest["vectors"].update(zip(added, ids.tolist()))
+            manifest["next_id"] += len(added)
 
-    # If no saved index, build from scratch
-    print("⚙️ Building FAISS index from scratch...")
-    vectorstore = FAISS.from_documents(all_documents, embeddings)
+        if index is None:
+            raise ValueError("No documents to index: parse screenshots or the QnA file first.")
+        save_index(index, manifest)
+        print("✅ Vector store updated and saved.")
 
-    os.makedirs(os.path.dirname(FAISS_INDEX_PATH), exist_ok=True)
-    faiss.write_index(vectorstore.index, FAISS_INDEX_PATH)
+    write_docstore(INDEX_DOCSTORE_PATH, (
+        (vector_id, documents_by_hash[doc_hash].page_content)
+        for doc_hash, vector_id in manifest["vectors"].items()
+    ))
+
+
+def load_or_build_vectorstore(embeddings):
+    """
+    Load the combined FAISS vectorstore for screenshots + QnA, embedding only what changed.
+
+    When the source files are unchanged since the last build, neither they nor the documents
+    are read: the index and the binary docstore are opened memory-mapped, so startup time and
+    memory do not grow with the corpus.
+    """
+    model = getattr(embeddings, "model", None)
+    sources = {"model": model, "sources": source_fingerprint()}
+
+    if all(os.path.exists(path) for path in (FAISS_INDEX_PATH, INDEX_DOCSTORE_PATH, INDEX_SOURCES_PATH)):
+        with open(INDEX_SOURCES_PATH, "r", encoding="utf-8") as f:
+            if json.load(f) == sources:
+                print("🔄 Sources unchanged; opening FAISS index and docstore from disk...")
+                vectorstore = open_vectorstore(embeddings)
+                print("✅ Vector store loaded successfully.")
+                return vectorstore
+
+    update_index(embeddings)
 
-    with open(DOCSTORE_PATH, "w", encoding="utf-8") as f:
-        json.dump([doc.dict() for doc in all_documents], f, ensure_ascii=False, indent=4)
+    # Written last: it marks the index, manifest and docstore as a consistent set
+    with open(INDEX_SOURCES_PATH, "w", encoding="utf-8") as f:
+        json.dump(sources, f)
 
-    print("✅ Vector store created and saved.")
+    vectorstore = open_vectorstore(embeddings)
+    print("✅ Vector store loaded successfully.")
     return vectorstore
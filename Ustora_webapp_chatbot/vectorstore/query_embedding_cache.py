@@ -0,0 +1,134 @@
+# query_embedding_cache.py
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+from config import QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_PATH, QUERY_EMBEDDING_CACHE_DISK_SIZE
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, model: str, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE,
+                 disk_path: Optional[str] = QUERY_EMBEDDING_CACHE_PATH,
+                 max_disk_entries: int = QUERY_EMBEDDING_CACHE_DISK_SIZE):
+        """
+        Two-tier cache of query embeddings: an in-process LRU in front of an optional SQLite file.
+
+        Args:
+            model: Embedding model name; part of every key so models never share vectors.
+            max_entries: Number of embeddings kept in memory.
+            disk_path: SQLite file for the second tier, or None for memory only.
+            max_disk_entries: Number of embeddings kept on disk; the oldest are dropped first.
+        """
+        self.model = model
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+            self._db.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return vector
+
+    def _get_disk(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def _put_disk(self, key: str, vector: List[float]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector) VALUES (?, ?)",
+                (key, array("f", vector).tobytes())
+            )
+            # Drop the oldest rows once the disk tier is over its bound
+            self._db.execute(
+                "DELETE FROM query_embeddings WHERE rowid <= "
+                "(SELECT MAX(rowid) FROM query_embeddings) - ?",
+                (self.max_disk_entries,)
+            )
+            self._db.commit()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self._key(text)
+        vector = self._get_memory(key)
+        if vector is None:
+            vector = self._get_disk(key)
+        return vector
+
+    def put(self, text: str, vector: List[float]):
+        key = self._key(text)
+        with self._lock:
+            self._remember(key, vector)
+        if self._db is not None:
+            self._put_disk(key, vector)
+
+    async def aget(self, text: str) -> Optional[List[float]]:
+        """
+        Async version of `get`: only the in-memory LRU is read on the event loop, SQLite on a thread.
+        """
+        key = self._key(text)
+        vector = self._get_memory(key)
+        if vector is None and self._db is not None:
+            vector = await asyncio.to_thread(self._get_disk, key)
+        elif vector is None:
+            vector = self._get_disk(key)
+        return vector
+
+    async def aput(self, text: str, vector: List[float]):
+        key = self._key(text)
+        with self._lock:
+            self._remember(key, vector)
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk, key, vector)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }